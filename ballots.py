@@ -0,0 +1,60 @@
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# So'rovnoma turlari: bitta variant, bir nechta variant va afzallik tartibi (instant-runoff)
+POLL_KINDS = ("single", "multi", "ranked")
+
+# Byulleten - tanlangan variant indekslari (afzallik tartibida) baytlar ko'rinishida.
+# Variantlar soni 10 tadan oshmaydi, shuning uchun har bir tanlov bitta bayt.
+def encode_ballot(choices: Sequence[int]) -> bytes:
+    return bytes(choices)
+
+def is_valid_ballot(kind: str, choices: Sequence[int], options: int) -> bool:
+    if not choices or len(set(choices)) != len(choices):
+        return False
+    if kind == "single" and len(choices) != 1:
+        return False
+    return all(0 <= choice < options for choice in choices)
+
+def new_tally(options: int) -> array:
+    return array('q', [0]) * options
+
+# Instant-runoff hisobi. Bir xil byulletenlar bitta yozuv (byulleten -> soni) sifatida
+# keladi. Har bir variantning "qoziq"ida hozir shu variantni tanlab turgan byulletenlar
+# bor; variant chiqarilganda faqat uning qozig'idagi byulletenlar keyingi tanlovga
+# o'tkaziladi, shuning uchun jami ish byulletenlar uzunligiga chiziqli.
+# Natija: g'olib (yoki None) va har bir tur uchun (hisob, chiqarilgan variant).
+def instant_runoff(ballots: Dict[bytes, int], options: int) -> Tuple[Optional[int], List[Tuple[array, Optional[int]]]]:
+    tally = new_tally(options)
+    piles: List[List[Tuple[bytes, int, int]]] = [[] for _ in range(options)]
+    for ballot, weight in ballots.items():
+        if ballot:
+            piles[ballot[0]].append((ballot, weight, 0))
+            tally[ballot[0]] += weight
+    eliminated = bytearray(options)
+    continuing = set(range(options))
+    rounds: List[Tuple[array, Optional[int]]] = []
+    while continuing:
+        active = sum(tally[option] for option in continuing)
+        if not active:
+            return None, rounds
+        # Teng kelganda ro'yxatda oldinroq turgan variant yetakchi, keyinroq turgani chiqariladi
+        leader = max(continuing, key=lambda option: (tally[option], -option))
+        if tally[leader] * 2 > active or len(continuing) == 1:
+            rounds.append((array('q', tally), None))
+            return leader, rounds
+        loser = min(continuing, key=lambda option: (tally[option], -option))
+        rounds.append((array('q', tally), loser))
+        continuing.discard(loser)
+        eliminated[loser] = 1
+        for ballot, weight, position in piles[loser]:
+            position += 1
+            while position < len(ballot) and eliminated[ballot[position]]:
+                position += 1
+            if position < len(ballot):
+                choice = ballot[position]
+                piles[choice].append((ballot, weight, position))
+                tally[choice] += weight
+        piles[loser] = []
+        tally[loser] = 0
+    return None, rounds
@@ -0,0 +1,591 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+from array import array
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.state import State, StatesGroup
+
+from voterset import IdSet
+from ballots import instant_runoff
+from poll_search import PollSearchIndex
+from callback_router import CallbackRouter, poll_id as parse_poll_id
+
+# Ovoz berganlar to'plami uchun xotira va tezlik o'lchovi: set() va IdSet
+def container_size(container) -> int:
+    if isinstance(container, IdSet):
+        blocks = sum(sys.getsizeof(block) for block in container.blocks)
+        buffer = sys.getsizeof(container.buffer) + sum(sys.getsizeof(i) for i in container.buffer)
+        return sys.getsizeof(container) + sys.getsizeof(container.blocks) + blocks + buffer
+    return sys.getsizeof(container) + sum(sys.getsizeof(i) for i in container)
+
+def measure(factory, ids: array):
+    started = time.perf_counter()
+    container = factory()
+    # array elementlari har safar yangi int obyekti sifatida olinadi, xuddi Telegram update'laridagidek
+    for user_id in ids:
+        if user_id not in container:
+            container.add(user_id)
+    build_time = time.perf_counter() - started
+    memory = container_size(container)
+
+    probes = random.sample(list(ids), min(len(ids), 100000))
+    started = time.perf_counter()
+    for user_id in probes:
+        assert user_id in container
+    lookup_time = (time.perf_counter() - started) / len(probes)
+    return memory, build_time, lookup_time
+
+def bench_memory(count: int):
+    ids = array('q', random.sample(range(10**6, 8 * 10**9), count))
+    print(f"{count} ta ID:")
+    for name, factory in (("set", set), ("IdSet", IdSet)):
+        memory, build_time, lookup_time = measure(factory, ids)
+        print(
+            f"  {name:6} {memory / 2**20:8.1f} MiB  {memory / count:6.1f} bayt/ID  "
+            f"qurish {build_time:6.2f} s  tekshirish {lookup_time * 1e9:6.0f} ns"
+        )
+
+# Afzallik bo'yicha hisob tezligi: tasodifiy (lekin bir-biriga o'xshash) byulletenlar
+def bench_irv(count: int, options: int = 8):
+    weights = [random.random() ** 2 for _ in range(options)]
+    ballots: Dict[bytes, int] = {}
+    for _ in range(count):
+        length = random.randint(1, options)
+        ranking = sorted(range(options), key=lambda i: random.random() * weights[i], reverse=True)[:length]
+        ballot = bytes(ranking)
+        ballots[ballot] = ballots.get(ballot, 0) + 1
+    started = time.perf_counter()
+    winner, rounds = instant_runoff(ballots, options)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{count} ta byulleten ({len(ballots)} xil), {options} variant: "
+        f"{len(rounds)} tur, g'olib {winner}, {elapsed * 1000:.1f} ms"
+    )
+
+# callback_query marshrutlash narxi: bot.py dagi tugmalar jadvali ikki usulda - avvalgi
+# F.data filtrlari zanjiri va CallbackRouter. Handlerlar bo'sh, shuning uchun o'lchov
+# faqat dispetcherlash (filtrlar, middleware, payload parse) vaqtini ko'rsatadi.
+class RoutePage(CallbackData, prefix="mp"):
+    status: str
+    before: int = 0
+    after: int = 0
+
+class RouteOption(CallbackData, prefix="s"):
+    poll_id: int
+    option: int
+
+class RouteState(StatesGroup):
+    waiting_for_kind = State()
+
+ROUTE_TABLE = [
+    "active_page_", "new_poll", "poll_kind_", "vote_", RouteOption, "b:", "select_", "notify_settings",
+    "notify_mode_", "my_polls", RoutePage, "manage_", "schedule_", "deactivate_", "activate_", "delete_",
+    "stats_", "live_", "export_", "admins", "add_admin", "remove_admin", "list_admins", "channels",
+    "add_channel", "remove_channel", "rcp:", "remove_ch_", "list_channels", "announcement", "audience_",
+    "unschedule_broadcast:", "stats", "botstats_"
+]
+ROUTE_SAMPLES = [
+    "vote_17", "s:17:2", "stats", "stats_17", "botstats_3", "export_17_csv",
+    "remove_ch_0_@bench", "mp:all:0:12", "unschedule_broadcast:1:99", "unknown_button"
+]
+
+def build_filter_dispatcher(handler) -> Dispatcher:
+    dp = Dispatcher()
+    for key in ROUTE_TABLE:
+        if isinstance(key, type):
+            dp.callback_query.register(handler, key.filter())
+        elif key == "poll_kind_":
+            dp.callback_query.register(handler, RouteState.waiting_for_kind, F.data.startswith(key))
+        elif key[-1] in "_:":
+            dp.callback_query.register(handler, F.data.startswith(key))
+        else:
+            dp.callback_query.register(handler, F.data == key)
+    return dp
+
+def build_router_dispatcher(handler) -> Tuple[Dispatcher, CallbackRouter]:
+    router = CallbackRouter()
+    parsers = {"vote_": parse_poll_id, "stats_": parse_poll_id, "manage_": parse_poll_id, "botstats_": int}
+    for key in ROUTE_TABLE:
+        router.route(key, parse=parsers.get(key), state=RouteState.waiting_for_kind if key == "poll_kind_" else None)(handler)
+    dp = Dispatcher()
+    dp.callback_query.outer_middleware(router)
+    dp.callback_query.register(router.handle)
+    return dp, router
+
+async def bench_route(count: int):
+    from aiogram.types import Update
+
+    async def handler(*args, **kwargs):
+        return None
+
+    bot = Bot("123456:BENCHBENCHBENCHBENCHBENCHBENCHBENCH", session=make_fake_session_class()(0, 0, 0))
+    updates = [
+        Update.model_validate(callback_update(i, 1000 + i, data), context={"bot": bot})
+        for i, data in enumerate(ROUTE_SAMPLES)
+    ]
+    router_dp, router = build_router_dispatcher(handler)
+    for name, dp in (("F.data zanjiri", build_filter_dispatcher(handler)), ("CallbackRouter", router_dp)):
+        for update in updates:
+            await dp.feed_update(bot, update)
+        started = time.perf_counter()
+        for _ in range(count):
+            for update in updates:
+                await dp.feed_update(bot, update)
+        elapsed = (time.perf_counter() - started) / (count * len(updates))
+        print(f"{name:18} {elapsed * 1e6:8.1f} us/callback")
+        per_sample = []
+        for update in updates:
+            started = time.perf_counter()
+            for _ in range(count):
+                await dp.feed_update(bot, update)
+            per_sample.append(f"{update.callback_query.data}={(time.perf_counter() - started) / count * 1e6:.1f}")
+        print(f"{'':18} {' '.join(per_sample)}")
+    started = time.perf_counter()
+    for _ in range(count):
+        for data in ROUTE_SAMPLES:
+            router.resolve(data)
+    elapsed = (time.perf_counter() - started) / (count * len(ROUTE_SAMPLES))
+    print(f"{'resolve()':18} {elapsed * 1e6:8.2f} us/callback")
+    await bot.session.close()
+
+# Inline qidiruv: har bir "harf" uchun indeksdan qidirish vaqti so'rovnomalar soniga qarab
+SEARCH_WORDS = [
+    "saylov", "sport", "futbol", "kino", "musiqa", "ta'lim", "maktab", "universitet", "shahar", "yangi",
+    "eng", "yaxshi", "so'rovnoma", "tanlov", "kitob", "o'yin", "taom", "sayohat", "ob-havo", "texnologiya"
+]
+
+def bench_search(count: int):
+    index = PollSearchIndex()
+    started = time.perf_counter()
+    titles = []
+    for poll_id in range(1, count + 1):
+        title = " ".join(random.sample(SEARCH_WORDS, 3)) + f" {poll_id}"
+        titles.append(title)
+        index.add(poll_id, title)
+    build_time = time.perf_counter() - started
+    queries = []
+    for _ in range(2000):
+        title = random.choice(titles)
+        # Foydalanuvchi sarlavhani harfma-harf yozadi
+        queries.append(title[:random.randint(1, len(title))])
+    started = time.perf_counter()
+    found = 0
+    for query in queries:
+        found += len(index.search(query)[0])
+    elapsed = (time.perf_counter() - started) / len(queries)
+    print(
+        f"{count} ta so'rovnoma: indeks {build_time * 1000:.0f} ms, "
+        f"qidiruv {elapsed * 1e6:.1f} us/so'rov, o'rtacha {found / len(queries):.1f} natija"
+    )
+
+# Yuklama testi: sintetik update'lar dp.feed_update ga beriladi, Telegram API esa
+# kechikish va 429 javoblarini taqlid qiluvchi soxta sessiya bilan almashtiriladi
+ADMIN_ID = 1
+BENCH_CHANNEL = "@bench_channel"
+
+def make_fake_session_class():
+    from aiogram.client.session.base import BaseSession
+    from aiogram.exceptions import TelegramRetryAfter
+    from aiogram.types import Chat, ChatMemberMember, Message, MessageId, User
+
+    class FakeTelegramSession(BaseSession):
+        def __init__(self, latency: float, retry_rate: float, retry_after: int):
+            super().__init__()
+            self.latency = latency
+            self.retry_rate = retry_rate
+            self.retry_after = retry_after
+            self.calls: Dict[str, int] = {}
+            self.message_id = 0
+
+        async def close(self) -> None:
+            pass
+
+        def _chat(self, chat_id: Any) -> Chat:
+            if isinstance(chat_id, int):
+                return Chat(id=chat_id, type="private")
+            return Chat(id=-1000000000000 - abs(hash(chat_id)) % 10**9, type="channel")
+
+        def _message(self, method: Any) -> Message:
+            self.message_id += 1
+            return Message(
+                message_id=self.message_id,
+                date=datetime.now(),
+                chat=self._chat(getattr(method, "chat_id", None) or 0),
+                text=getattr(method, "text", None)
+            )
+
+        async def make_request(self, bot: Any, method: Any, timeout: Optional[int] = None) -> Any:
+            name = type(method).__name__
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.latency:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+            if self.retry_rate and random.random() < self.retry_rate:
+                raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=self.retry_after)
+            if name == "GetChatMember":
+                return ChatMemberMember(user=User(id=method.user_id, is_bot=False, first_name="u"))
+            if name == "CopyMessage":
+                return MessageId(message_id=1)
+            if name == "GetMe":
+                return User(id=0, is_bot=True, first_name="bot", username="bench_bot")
+            if name in ("SendMessage", "SendPhoto", "EditMessageText", "EditMessageCaption"):
+                return self._message(method)
+            return True
+
+        async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                                 chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+            yield b""
+
+    return FakeTelegramSession
+
+def user_payload(user_id: int) -> Dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+def message_update(update_id: int, user_id: int, text: str) -> Dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user_payload(user_id),
+            "text": text
+        }
+    }
+
+def callback_update(update_id: int, user_id: int, data: str) -> Dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user_payload(user_id),
+            "chat_instance": "bench",
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": 0, "is_bot": True, "first_name": "bot"},
+                "text": "bench"
+            }
+        }
+    }
+
+def inline_update(update_id: int, user_id: int, query: str) -> Dict:
+    return {
+        "update_id": update_id,
+        "inline_query": {
+            "id": str(update_id),
+            "from": user_payload(user_id),
+            "query": query,
+            "offset": ""
+        }
+    }
+
+# Ko'p variantli/afzallik so'rovnomasi klaviaturasidagi tugma: variant, Tozalash yoki Yuborish
+def ballot_button(app: Any, poll_id: str, picked: List[int], option: int) -> str:
+    rows = app.get_ballot_keyboard(poll_id, picked).inline_keyboard
+    if option >= 0:
+        return rows[option][0].callback_data
+    return rows[-1][0 if option == app.BALLOT_RESET else 1].callback_data
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class LoadBench:
+    def __init__(self, app: Any, concurrency: int):
+        self.app = app
+        self.concurrency = concurrency
+        self.update_id = 0
+
+    def next_id(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    async def feed(self, payload: Dict) -> Optional[float]:
+        from aiogram.types import Update
+        update = Update.model_validate(payload, context={"bot": self.app.bot})
+        started = time.perf_counter()
+        try:
+            await self.app.dp.feed_update(self.app.bot, update)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    async def run(self, name: str, payloads: List[Dict], concurrency: Optional[int] = None):
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def worker(payload: Dict) -> Optional[float]:
+            async with semaphore:
+                return await self.feed(payload)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(worker(payload) for payload in payloads))
+        elapsed = time.perf_counter() - started
+        latencies = [r for r in results if r is not None]
+        errors = len(results) - len(latencies)
+        print(
+            f"{name:18} {len(payloads):8} upd  {len(payloads) / elapsed:9.0f} upd/s  "
+            f"p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  p99 {percentile(latencies, 0.99) * 1000:7.2f} ms  "
+            f"xato {errors:5}  RSS {peak_rss_mib():7.1f} MiB"
+        )
+
+    async def create_polls(self, count: int, options: int, kind: str = "single") -> List[str]:
+        names = ", ".join(f"Variant {i}" for i in range(options))
+        for i in range(count):
+            for payload in (
+                callback_update(self.next_id(), ADMIN_ID, "new_poll"),
+                message_update(self.next_id(), ADMIN_ID, f"Benchmark so'rovnoma {i}"),
+                message_update(self.next_id(), ADMIN_ID, "skip"),
+                message_update(self.next_id(), ADMIN_ID, names),
+                callback_update(self.next_id(), ADMIN_ID, f"poll_kind_{kind}")
+            ):
+                await self.feed(payload)
+        return list(self.app.polls)
+
+    async def broadcast(self, text: str):
+        await self.feed(callback_update(self.next_id(), ADMIN_ID, "announcement"))
+        await self.feed(callback_update(self.next_id(), ADMIN_ID, "audience_all"))
+        started = time.perf_counter()
+        await self.feed(message_update(self.next_id(), ADMIN_ID, text))
+        handler_time = time.perf_counter() - started
+        await asyncio.sleep(0)
+        while self.app.current_broadcast is not None:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        recipients = len(self.app.users) - len(self.app.inactive_users)
+        print(
+            f"{'send_announcement':18} {recipients:8} msg  {recipients / elapsed:9.0f} msg/s  "
+            f"handler {handler_time * 1000:7.2f} ms  jami {elapsed:7.2f} s  RSS {peak_rss_mib():7.1f} MiB"
+        )
+
+def set_bench_environment(workdir: str):
+    os.environ.update({
+        "BOT_TOKEN": "123456:BENCHBENCHBENCHBENCHBENCHBENCHBENCH",
+        "ADMIN_IDS": str(ADMIN_ID),
+        "CHANNELS": BENCH_CHANNEL,
+        "DB_PATH": os.path.join(workdir, "bot.db"),
+        "FSM_DB_PATH": os.path.join(workdir, "fsm.db"),
+        "VOTE_JOURNAL_PATH": os.path.join(workdir, "votes.journal"),
+        "BROADCAST_STATE_FILE": os.path.join(workdir, "broadcast_state.json"),
+        "METRICS_PORT": "0"
+    })
+
+async def bench_load(args: argparse.Namespace):
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    set_bench_environment(workdir)
+    os.environ.update({
+        "BROADCAST_RATE": str(args.broadcast_rate),
+        "ADMIN_NOTIFY_DEFAULT_MODE": "digest"
+    })
+    if not args.throttle:
+        # Sintetik admin bir soniyada yuzlab so'rov yuboradi, cheklov o'lchovni buzmasligi kerak
+        os.environ.update({"THROTTLE_VOTE": "0", "THROTTLE_START": "0", "THROTTLE_ADMIN": "0"})
+    import bot as app
+
+    app.bot.session = make_fake_session_class()(args.latency, args.retry_rate, args.retry_after)
+    app.bot.session.middleware(app.api_metrics)
+    app.broadcast_bot.session = app.bot.session
+    await app.on_startup()
+    try:
+        bench = LoadBench(app, args.concurrency)
+        poll_ids = await bench.create_polls(args.polls, args.options, args.kind)
+        user_ids = range(1000, 1000 + args.users)
+        print(f"{args.users} foydalanuvchi, {len(poll_ids)} so'rovnoma, parallellik {args.concurrency}")
+
+        await bench.run("start", [message_update(bench.next_id(), u, "/start") for u in user_ids])
+        choices = {u: (random.choice(poll_ids), random.randrange(args.options)) for u in user_ids}
+        await bench.run("vote_handler", [
+            callback_update(bench.next_id(), u, f"vote_{choices[u][0]}") for u in user_ids
+        ])
+        if args.kind == "single":
+            votes = bench.run("select_option", [
+                callback_update(bench.next_id(), u, app.SelectOption(poll_id=int(choices[u][0]), option=choices[u][1]).pack())
+                for u in user_ids
+            ])
+            if args.spike:
+                # Ovozlar bilan bir vaqtda yangi foydalanuvchilarning /start to'lqini
+                spike_ids = range(1000 + args.users, 1000 + args.users + args.spike)
+                await asyncio.gather(votes, bench.run(
+                    "start_spike", [message_update(bench.next_id(), u, "/start") for u in spike_ids], 1000
+                ))
+                shed = ", ".join(f"{name}={count}" for name, count in zip(app.PRIORITY_NAMES, app.update_gate.shed))
+                print(f"Rad etilgan update'lar: {shed}")
+            else:
+                await votes
+        else:
+            rankings = {u: random.sample(range(args.options), random.randint(1, args.options)) for u in user_ids}
+            # Tugmalar bot yuboradigan klaviaturadan olinadi: birinchi bosish bo'sh klaviaturadan
+            await bench.run("ballot_click", [
+                callback_update(bench.next_id(), u, ballot_button(app, choices[u][0], rankings[u][:i], option))
+                for u in user_ids for i, option in enumerate(rankings[u])
+            ])
+            await bench.run("ballot_option", [
+                callback_update(bench.next_id(), u, ballot_button(app, choices[u][0], rankings[u], app.BALLOT_SUBMIT))
+                for u in user_ids
+            ])
+            ballots = sum(app.polls[poll_id]['ballots'] for poll_id in poll_ids)
+            print(f"Qabul qilingan byulletenlar: {ballots} / {args.users}")
+            await bench.run("show_poll_stats", [
+                callback_update(bench.next_id(), ADMIN_ID, f"stats_{poll_id}") for poll_id in poll_ids
+            ])
+        titles = [app.polls[poll_id]['title'] for poll_id in poll_ids]
+        await bench.run("share_poll_inline", [
+            inline_update(bench.next_id(), u, random.choice(titles)[:random.randint(0, 12)]) for u in user_ids
+        ])
+        await bench.run("show_bot_stats", [
+            callback_update(bench.next_id(), ADMIN_ID, "stats") for _ in range(args.stats_requests)
+        ])
+        if not args.skip_broadcast:
+            await bench.broadcast("Benchmark xabarnomasi")
+
+        calls = ", ".join(f"{name}={count}" for name, count in sorted(app.bot.session.calls.items()))
+        print(f"API chaqiruvlari: {calls}")
+    finally:
+        await app.close_storage()
+
+# Jarayonlar o'rtasida FSM holatini uzatish tekshiruvi: so'rovnoma yaratish bir jarayonda
+# boshlanib, boshqasida tugaydi; keyin bir nechta jarayon bitta bazadan ID ajratadi.
+# Har bir qadam alohida "python bench.py handoff --step ..." jarayonida bajariladi.
+HANDOFF_TITLE = "Jarayonlararo so'rovnoma"
+
+async def handoff_step(step: str, workdir: str, count: int):
+    set_bench_environment(workdir)
+    os.environ.update({"THROTTLE_VOTE": "0", "THROTTLE_START": "0", "THROTTLE_ADMIN": "0"})
+    if step == "allocate":
+        from storage import SqlitePollRepository
+        repository = SqlitePollRepository(os.environ["DB_PATH"])
+        await repository.open()
+        try:
+            print(" ".join([await repository.allocate_poll_id() for _ in range(count)]))
+        finally:
+            await repository.close()
+        return
+
+    import bot as app
+    from aiogram.fsm.storage.base import StorageKey
+
+    app.bot.session = make_fake_session_class()(0, 0, 0)
+    app.broadcast_bot.session = app.bot.session
+    await app.on_startup()
+    try:
+        bench = LoadBench(app, 1)
+        bench.update_id = 0 if step == "start" else 100
+        if step == "start":
+            payloads = [
+                callback_update(bench.next_id(), ADMIN_ID, "new_poll"),
+                message_update(bench.next_id(), ADMIN_ID, HANDOFF_TITLE),
+                message_update(bench.next_id(), ADMIN_ID, "skip")
+            ]
+        else:
+            payloads = [
+                message_update(bench.next_id(), ADMIN_ID, "Ha, Yo'q"),
+                callback_update(bench.next_id(), ADMIN_ID, "poll_kind_single")
+            ]
+        for payload in payloads:
+            await bench.feed(payload)
+        key = StorageKey(bot_id=app.bot.id, chat_id=ADMIN_ID, user_id=ADMIN_ID)
+        print(f"{step}: holat={await app.dp.storage.get_state(key)} so'rovnomalar={list(app.polls)}")
+    finally:
+        await app.close_storage()
+
+def bench_handoff(processes: int, count: int):
+    workdir = tempfile.mkdtemp(prefix="bench_handoff_")
+    command = [sys.executable, os.path.abspath(__file__), "handoff", "--workdir", workdir]
+    for step in ("start", "finish"):
+        subprocess.run(command + ["--step", step], check=True)
+
+    import sqlite3
+    conn = sqlite3.connect(os.path.join(workdir, "bot.db"))
+    rows = conn.execute("SELECT id, title, options FROM polls").fetchall()
+    conn.close()
+    print(f"bot.db dagi so'rovnomalar: {rows}")
+    assert [row[1] for row in rows] == [HANDOFF_TITLE], "so'rovnoma boshqa jarayonda yakunlanmadi"
+
+    workers = [
+        subprocess.Popen(command + ["--step", "allocate", "--count", str(count)], stdout=subprocess.PIPE, text=True)
+        for _ in range(processes)
+    ]
+    ids = []
+    for worker in workers:
+        output, _ = worker.communicate()
+        assert worker.returncode == 0, "ID ajratish jarayoni xato bilan tugadi"
+        ids.extend(output.split())
+    print(f"{processes} jarayon {len(ids)} ta ID ajratdi, takrorlanmaganlari {len(set(ids))}")
+    assert len(ids) == len(set(ids)), "bir xil ID ikki marta ajratildi"
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot benchmarklari")
+    commands = parser.add_subparsers(dest="command")
+
+    memory = commands.add_parser("memory", help="set() va IdSet xotira sarfi")
+    memory.add_argument("counts", nargs="*", type=int, default=[100000, 1000000])
+
+    load = commands.add_parser("load", help="handlerlar o'tkazuvchanligi va kechikishi")
+    load.add_argument("--users", type=int, default=5000)
+    load.add_argument("--polls", type=int, default=20)
+    load.add_argument("--options", type=int, default=4)
+    load.add_argument("--concurrency", type=int, default=100)
+    load.add_argument("--stats-requests", type=int, default=200)
+    load.add_argument("--latency", type=float, default=0.02, help="API kechikishi, soniya")
+    load.add_argument("--retry-rate", type=float, default=0.0, help="429 javoblari ulushi")
+    load.add_argument("--retry-after", type=int, default=1)
+    load.add_argument("--broadcast-rate", type=float, default=1000)
+    load.add_argument("--skip-broadcast", action="store_true")
+    load.add_argument("--throttle", action="store_true", help="flood cheklovini yoqilgan holda o'lchash")
+    load.add_argument("--kind", choices=("single", "multi", "ranked"), default="single", help="so'rovnoma turi")
+    load.add_argument("--spike", type=int, default=0, help="ovozlar bilan bir vaqtda yuboriladigan /start soni")
+
+    irv = commands.add_parser("irv", help="instant-runoff hisobi tezligi")
+    irv.add_argument("counts", nargs="*", type=int, default=[10000, 100000, 1000000])
+    irv.add_argument("--options", type=int, default=8)
+
+    search = commands.add_parser("search", help="inline qidiruv indeksi tezligi")
+    search.add_argument("counts", nargs="*", type=int, default=[1000, 10000, 100000])
+
+    route = commands.add_parser("route", help="callback_query marshrutlash narxi")
+    route.add_argument("--count", type=int, default=2000)
+
+    handoff = commands.add_parser("handoff", help="FSM holatini jarayonlar o'rtasida uzatish va ID ajratish")
+    handoff.add_argument("--processes", type=int, default=4)
+    handoff.add_argument("--count", type=int, default=200, help="har bir jarayon ajratadigan ID lar soni")
+    handoff.add_argument("--step", choices=("start", "finish", "allocate"), help=argparse.SUPPRESS)
+    handoff.add_argument("--workdir", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.command == "load":
+        asyncio.run(bench_load(args))
+    elif args.command == "search":
+        for count in args.counts:
+            bench_search(count)
+    elif args.command == "route":
+        asyncio.run(bench_route(args.count))
+    elif args.command == "handoff":
+        if args.step:
+            asyncio.run(handoff_step(args.step, args.workdir, args.count))
+        else:
+            bench_handoff(args.processes, args.count)
+    elif args.command == "irv":
+        for count in args.counts:
+            bench_irv(count, args.options)
+    else:
+        for count in getattr(args, "counts", None) or [100000, 1000000]:
+            bench_memory(count)
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,606 @@
 import os
+import io
+import html
+import bisect
+import csv
+import json
+import time
+import tempfile
+import threading
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, F
+from collections import OrderedDict, deque
+from aiogram import Bot, Dispatcher, F, BaseMiddleware
 from aiogram.enums import ParseMode
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer, PRODUCTION
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web, ClientSession, TraceConfig
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated, InlineKeyboardMarkup, InlineKeyboardButton, InputFile
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from aiogram.filters import CommandStart, Command
-from aiogram.exceptions import TelegramBadRequest
-from typing import List, Dict, Set, Optional
-from datetime import datetime
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from typing import Any, AsyncGenerator, Awaitable, Callable, Deque, List, Dict, Sequence, Set, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from storage import SqlitePollRepository, VoteJournal
+from fsm_storage import create_fsm_storage
+from voterset import IdSet
+from metrics import MetricsRegistry
+from timeline import VoteTimeline, sparkline
+from scheduler import Scheduler
+from ballots import POLL_KINDS, encode_ballot, is_valid_ballot, new_tally, instant_runoff
+from callback_router import CallbackRouter, poll_id as parse_poll_id
+from update_gate import UpdateGate
+from poll_search import PollSearchIndex
 
 # Muhit o'zgaruvchilarini o'qish
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_IDS = list(map(int, os.getenv("ADMIN_IDS", "").split(",")))
 CHANNELS = os.getenv("CHANNELS", "").split(",")
 
+# A'zolik keshi sozlamalari (soniyalarda)
+MEMBER_CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", "300"))
+MEMBER_CACHE_NEGATIVE_TTL = float(os.getenv("MEMBER_CACHE_NEGATIVE_TTL", "30"))
+MEMBER_CACHE_MAX_ENTRIES = int(os.getenv("MEMBER_CACHE_MAX_ENTRIES", "200000"))
+
+# Ma'lumotlar bazasi sozlamalari
+DB_PATH = os.getenv("DB_PATH", "bot.db")
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "0.5"))
+VOTE_JOURNAL_PATH = os.getenv("VOTE_JOURNAL_PATH", "votes.journal")
+VOTE_JOURNAL_COMMIT_INTERVAL = float(os.getenv("VOTE_JOURNAL_COMMIT_INTERVAL", "0.005"))
+VOTE_JOURNAL_CHECKPOINT_INTERVAL = float(os.getenv("VOTE_JOURNAL_CHECKPOINT_INTERVAL", "60"))
+
+# Adminlarga ovoz bildirishnomalari: realtime, digest yoki off
+ADMIN_NOTIFY_DEFAULT_MODE = os.getenv("ADMIN_NOTIFY_DEFAULT_MODE", "digest")
+ADMIN_DIGEST_INTERVAL = float(os.getenv("ADMIN_DIGEST_INTERVAL", "60"))
+
+# /start dagi faol so'rovnomalar ro'yxatining bir sahifasidagi tugmalar soni
+START_PAGE_SIZE = int(os.getenv("START_PAGE_SIZE", "10"))
+# Bot statistikasidagi so'rovnomalar ro'yxatining bir sahifasidagi qatorlar soni
+STATS_PAGE_SIZE = int(os.getenv("STATS_PAGE_SIZE", "15"))
+# Jonli natijalar xabari eng ko'pi bilan shuncha soniyada bir marta tahrirlanadi
+LIVE_RESULTS_INTERVAL = float(os.getenv("LIVE_RESULTS_INTERVAL", "5"))
+# "Mening so'rovnomalarim" va admin menyularidagi bir sahifadagi tugmalar soni
+MENU_PAGE_SIZE = int(os.getenv("MENU_PAGE_SIZE", "10"))
+# Rejalashtirilgan vaqtlar shu mintaqada kiritiladi va ko'rsatiladi (soat, UTC ga nisbatan)
+SCHEDULE_TZ = timezone(timedelta(hours=float(os.getenv("SCHEDULE_UTC_OFFSET", "5"))))
+# Inline rejimdagi natijalar Telegram serverida shuncha soniya keshlanadi
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "60"))
+
+# Ishga tushirish rejimi: "polling" yoki "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+# 1 - yangilanish fon vazifasida qayta ishlanadi va Telegramga darhol javob qaytadi,
+# 0 - handler webhook javobi ichida bajariladi
+WEBHOOK_HANDLE_IN_BACKGROUND = os.getenv("WEBHOOK_HANDLE_IN_BACKGROUND", "1") == "1"
+# FSM holatlari ombori: "sqlite" (bir nechta jarayon uchun umumiy), "redis" yoki "memory".
+# Jarayonlar o'rtasida faqat FSM holati umumiy: so'rovnomalar, ovoz berganlar va hisoblagichlar
+# har bir jarayon xotirasida, shuning uchun bitta bot.db bilan bitta jarayon ishlashi kerak.
+# Umumiy FSM qayta ishga tushirishda (yangi jarayon eskisining o'rnini egallaganda) boshlangan
+# jarayonlarni saqlab qoladi.
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_DB_PATH = os.getenv("FSM_DB_PATH", "fsm.db")
+REDIS_URL = os.getenv("REDIS_URL")
+# Foydalanuvchi bo'yicha cheklov: "<so'rovlar soni>/<soniya>", "0" - cheklovsiz
+THROTTLE_VOTE = os.getenv("THROTTLE_VOTE", "5/1")
+THROTTLE_START = os.getenv("THROTTLE_START", "3/10")
+THROTTLE_ADMIN = os.getenv("THROTTLE_ADMIN", "30/1")
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "100000"))
+# Bir vaqtda ishlaydigan handlerlar soni: jami va admin/boshqa sinflar uchun alohida
+# (ovozlar faqat jami chegara bilan cheklanadi). Boshqa sinfdagi update navbatda
+# UPDATE_SHED_DEPTH tadan ko'p kutsa, UPDATE_SHED_WAIT soniyadan ortiq kutsa, ovozlar
+# navbatda tursa yoki event loop kechikishi UPDATE_SHED_LOOP_LAG soniyadan oshsa rad etiladi
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "256"))
+UPDATE_CONCURRENCY_ADMIN = int(os.getenv("UPDATE_CONCURRENCY_ADMIN", "16"))
+UPDATE_CONCURRENCY_OTHER = int(os.getenv("UPDATE_CONCURRENCY_OTHER", "32"))
+UPDATE_SHED_DEPTH = int(os.getenv("UPDATE_SHED_DEPTH", "500"))
+UPDATE_SHED_WAIT = float(os.getenv("UPDATE_SHED_WAIT", "2"))
+UPDATE_SHED_LOOP_LAG = float(os.getenv("UPDATE_SHED_LOOP_LAG", "0.1"))
+# Prometheus /metrics manzili (METRICS_PORT=0 - o'chirilgan) va sekin update chegarasi
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+SLOW_UPDATE_THRESHOLD = float(os.getenv("SLOW_UPDATE_THRESHOLD", "1.0"))
+# Bot API ulanishlari: interaktiv javoblar va xabarnomalar alohida pullardan foydalanadi
+BOT_API_POOL_SIZE = int(os.getenv("BOT_API_POOL_SIZE", "100"))
+BROADCAST_POOL_SIZE = int(os.getenv("BROADCAST_POOL_SIZE", "50"))
+BOT_API_KEEPALIVE = float(os.getenv("BOT_API_KEEPALIVE", "60"))
+BOT_API_TIMEOUT = float(os.getenv("BOT_API_TIMEOUT", "30"))
+BOT_API_DNS_TTL = int(os.getenv("BOT_API_DNS_TTL", "3600"))
+# Bot API manzili (mahalliy Bot API server yoki test uchun soxta server)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Sozlanadigan ulanishlar puli va har bir so'rov bosqichlari vaqtini o'lchash
+# (pulda navbat kutish, DNS, ulanish, javob sarlavhalarigacha)
+def create_trace_config(pool: str) -> TraceConfig:
+    trace = TraceConfig()
+
+    async def on_request_start(session, ctx, params):
+        ctx.started = ctx.phase_started = time.perf_counter()
+
+    def phase_callback(phase: str):
+        async def callback(session, ctx, params):
+            now = time.perf_counter()
+            http_phase_latency.observe(now - ctx.phase_started, pool=pool, phase=phase)
+            ctx.phase_started = now
+        return callback
+
+    async def on_phase_start(session, ctx, params):
+        ctx.phase_started = time.perf_counter()
+
+    async def on_connection_reuse(session, ctx, params):
+        http_connections.inc(pool=pool, kind="reused")
+
+    async def on_connection_created(session, ctx, params):
+        http_connections.inc(pool=pool, kind="new")
+        await phase_callback("connect")(session, ctx, params)
+
+    async def on_request_end(session, ctx, params):
+        http_phase_latency.observe(time.perf_counter() - ctx.started, pool=pool, phase="total")
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_queued_start.append(on_phase_start)
+    trace.on_connection_queued_end.append(phase_callback("queued"))
+    trace.on_dns_resolvehost_start.append(on_phase_start)
+    trace.on_dns_resolvehost_end.append(phase_callback("dns"))
+    trace.on_connection_create_start.append(on_phase_start)
+    trace.on_connection_create_end.append(on_connection_created)
+    trace.on_connection_reuseconn.append(on_connection_reuse)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+class TunedAiohttpSession(AiohttpSession):
+    def __init__(self, pool: str, limit: int, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self._connector_init.update(
+            limit=limit,
+            keepalive_timeout=BOT_API_KEEPALIVE,
+            ttl_dns_cache=BOT_API_DNS_TTL
+        )
+
+    async def create_session(self) -> ClientSession:
+        if self._should_reset_connector:
+            await self.close()
+        
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={"User-Agent": f"ovozberingchibot ({self.pool})"},
+                trace_configs=[create_trace_config(self.pool)]
+            )
+            self._should_reset_connector = False
+        
+        return self._session
+
 # Bot konfiguratsiyasi
-bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML)
-dp = Dispatcher(storage=MemoryStorage())
+api_server = TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL else PRODUCTION
+bot = Bot(
+    token=BOT_TOKEN,
+    session=TunedAiohttpSession("interactive", BOT_API_POOL_SIZE, api=api_server, timeout=BOT_API_TIMEOUT),
+    parse_mode=ParseMode.HTML
+)
+# Xabarnomalar uchun alohida ulanishlar puli, ular interaktiv javoblarni kutdirmasligi uchun
+broadcast_bot = Bot(
+    token=BOT_TOKEN,
+    session=TunedAiohttpSession("broadcast", BROADCAST_POOL_SIZE, api=api_server, timeout=BOT_API_TIMEOUT),
+    parse_mode=ParseMode.HTML
+)
+dp = Dispatcher(storage=create_fsm_storage(FSM_STORAGE, FSM_DB_PATH, REDIS_URL))
+
+# A'zolik keshi: (user_id, kanal) -> (a'zomi, amal qilish muddati). Yozuvlar oxirgi
+# ishlatilish tartibida; yangi yozuv qo'shilganda boshidagi muddati o'tganlari va
+# MEMBER_CACHE_MAX_ENTRIES dan ortiqlari (eng uzoq ishlatilmaganlari) chiqariladi
+member_cache: "OrderedDict[Tuple[int, str], Tuple[bool, float]]" = OrderedDict()
+member_inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+member_cache_stats = {"hits": 0, "misses": 0}
+
+def invalidate_member_cache(user_id: int, channel: Optional[str] = None):
+    if channel is not None:
+        member_cache.pop((user_id, channel), None)
+        return
+    for key in [k for k in member_cache if k[0] == user_id]:
+        del member_cache[key]
+
+# Telegram foydalanuvchi kanalda yo'qligini shu xatolar bilan bildiradi
+MEMBER_NOT_FOUND = ("user not found", "PARTICIPANT_ID_INVALID")
+
+# None - a'zolik aniqlanmadi (429, tarmoq yoki server xatosi); bunday natija keshlanmaydi
+async def _fetch_channel_membership(user_id: int, channel: str) -> Optional[bool]:
+    try:
+        member = await bot.get_chat_member(chat_id=channel, user_id=user_id)
+        return member.status in ("member", "administrator", "creator")
+    except TelegramBadRequest as e:
+        if any(reason in e.message for reason in MEMBER_NOT_FOUND):
+            return False
+        logging.error(f"Kanalga a'zolikni tekshirishda xato: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Kanalga a'zolikni tekshirishda xato: {e}")
+        return None
+
+async def is_channel_member(user_id: int, channel: str) -> Optional[bool]:
+    key = (user_id, channel)
+    cached = member_cache.get(key)
+    now = time.monotonic()
+    if cached is not None:
+        if cached[1] > now:
+            member_cache_stats["hits"] += 1
+            member_cache.move_to_end(key)
+            return cached[0]
+        del member_cache[key]
+    
+    # Bir xil kalit uchun parallel so'rovlar bitta API chaqiruvini kutadi
+    future = member_inflight.get(key)
+    if future is not None:
+        member_cache_stats["hits"] += 1
+        return await asyncio.shield(future)
+    
+    member_cache_stats["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    member_inflight[key] = future
+    try:
+        is_member = await _fetch_channel_membership(user_id, channel)
+        now = time.monotonic()
+        if is_member is not None:
+            ttl = MEMBER_CACHE_TTL if is_member else MEMBER_CACHE_NEGATIVE_TTL
+            member_cache[key] = (is_member, now + ttl)
+        while member_cache:
+            oldest_key, (_, expires_at) = next(iter(member_cache.items()))
+            if len(member_cache) <= MEMBER_CACHE_MAX_ENTRIES and expires_at > now:
+                break
+            del member_cache[oldest_key]
+        future.set_result(is_member)
+    except BaseException:
+        future.cancel()
+        raise
+    finally:
+        member_inflight.pop(key, None)
+    return is_member
 
 # Kanalga a'zolikni tekshirish
 async def check_channel_subscription(user_id: int) -> bool:
+    channels = [channel for channel in CHANNELS if channel]
+    if not channels:
+        return True
+    results = await asyncio.gather(*(is_channel_member(user_id, channel) for channel in channels))
+    if None in results:
+        # A'zolik aniqlanmadi: bu safar o'tkazilmaydi, lekin obunachilar segmenti o'zgarmaydi
+        return False
+    set_user_subscribed(user_id, all(results))
+    return all(results)
+
+# Kanal a'zoligi o'zgarganda keshni yangilash
+@dp.chat_member()
+async def on_chat_member_update(update: ChatMemberUpdated):
+    chat = update.chat
+    user_id = update.new_chat_member.user.id
+    names = {str(chat.id)}
+    if chat.username:
+        names.add(f"@{chat.username}".lower())
     for channel in CHANNELS:
+        if channel.lower() in names:
+            invalidate_member_cache(user_id, channel)
+            if update.new_chat_member.status not in ("member", "administrator", "creator"):
+                set_user_subscribed(user_id, False)
+
+# Foydalanuvchi bo'yicha sirpanuvchi oyna cheklovi (flood control)
+def parse_throttle_rule(rule: str) -> Optional[Tuple[int, float]]:
+    if not rule or rule == "0":
+        return None
+    limit, _, window = rule.partition("/")
+    limit, window = int(limit), float(window or 1)
+    # "0/10" ham "0" kabi cheklovsiz: bo'sh oyna (deque(maxlen=0)) bilan ishlab bo'lmaydi
+    if limit <= 0 or window <= 0:
+        return None
+    return limit, window
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, rules: Dict[str, Tuple[int, float]], max_users: int):
+        self.rules = rules
+        self.max_users = max_users
+        # (guruh, user_id) -> so'nggi so'rovlar vaqtlari; eng eski faollik boshida turadi
+        self.hits: "OrderedDict[Tuple[str, int], Deque[float]]" = OrderedDict()
+
+    @staticmethod
+    def classify(event: Any) -> Optional[str]:
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return None
+        if isinstance(event, CallbackQuery):
+            data = event.data or ""
+            if data.startswith(("vote_", "select_", f"{SelectOption.__prefix__}:", f"{BallotOption.__prefix__}:")):
+                return "vote"
+            return "admin" if user.id in ADMIN_IDS else None
+        if isinstance(event, Message) and event.text and event.text.startswith("/start"):
+            return "start"
+        return None
+
+    def _evict(self, now: float):
+        while self.hits:
+            key, timestamps = next(iter(self.hits.items()))
+            window = self.rules[key[0]][1]
+            if len(self.hits) < self.max_users and timestamps and now - timestamps[-1] < window:
+                break
+            self.hits.popitem(last=False)
+
+    def allow(self, group: str, user_id: int) -> bool:
+        limit, window = self.rules[group]
+        now = time.monotonic()
+        key = (group, user_id)
+        timestamps = self.hits.get(key)
+        if timestamps is None:
+            self._evict(now)
+            timestamps = self.hits[key] = deque(maxlen=limit)
+        else:
+            self.hits.move_to_end(key)
+        if len(timestamps) == limit and now - timestamps[0] < window:
+            return False
+        timestamps.append(now)
+        return True
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        group = self.classify(event)
+        if group in self.rules and not self.allow(group, event.from_user.id):
+            if isinstance(event, CallbackQuery):
+                await event.answer()
+            return None
+        return await handler(event, data)
+
+# Foydalanuvchining so'nggi faolligini kunlik segmentlarga yozadi
+class ActivityMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is not None:
+            mark_user_seen(user.id)
+        return await handler(event, data)
+
+throttle_rules = {
+    group: rule for group, rule in (
+        ("vote", parse_throttle_rule(THROTTLE_VOTE)),
+        ("start", parse_throttle_rule(THROTTLE_START)),
+        ("admin", parse_throttle_rule(THROTTLE_ADMIN))
+    ) if rule is not None
+}
+throttling = ThrottlingMiddleware(throttle_rules, THROTTLE_MAX_USERS)
+dp.message.outer_middleware(throttling)
+dp.callback_query.outer_middleware(throttling)
+activity = ActivityMiddleware()
+dp.message.outer_middleware(activity)
+dp.callback_query.outer_middleware(activity)
+
+# Yuklama oshganda update'lar ustuvorlik bo'yicha navbatga turadi: ovozlar va foydalanuvchi
+# tugmalari birinchi, admin menyulari keyin, qolganlari (/start va boshqa xabarlar) oxirida.
+# Oxirgi sinf navbat uzun bo'lsa, ovozlar kutib qolsa yoki event loop kechiksa xushmuomala
+# javob bilan rad etiladi (inline so'rovlar javobsiz tashlab yuboriladi).
+PRIORITY_VOTE, PRIORITY_ADMIN, PRIORITY_OTHER = 0, 1, 2
+PRIORITY_NAMES = ("vote", "admin", "other")
+BUSY_TEXT = "Bot hozir juda band. Iltimos, birozdan so'ng qayta urinib ko'ring."
+
+class LoadSheddingMiddleware(BaseMiddleware):
+    def __init__(self, gate: UpdateGate):
+        self.gate = gate
+        # Event loop kechikishining eksponensial o'rtachasi; monitor_loop_lag har
+        # LOOP_LAG_INTERVAL da yangilaydi, shuning uchun yuklama tushgach o'zi nolga qaytadi
+        self.loop_lag = 0.0
+
+    def observe_lag(self, lag: float):
+        self.loop_lag += (max(lag, 0.0) - self.loop_lag) * 0.3
+
+    def overloaded(self) -> bool:
+        if self.gate.queued[PRIORITY_VOTE]:
+            return True
+        return bool(UPDATE_SHED_LOOP_LAG) and self.loop_lag > UPDATE_SHED_LOOP_LAG
+
+    @staticmethod
+    def classify(event: Any) -> int:
+        user = getattr(event, "from_user", None)
+        if isinstance(event, CallbackQuery):
+            if ThrottlingMiddleware.classify(event) == "admin":
+                return PRIORITY_ADMIN
+            return PRIORITY_VOTE
+        if isinstance(event, Message) and user is not None and user.id in ADMIN_IDS:
+            return PRIORITY_ADMIN
+        return PRIORITY_OTHER
+
+    async def shed(self, event: Any, priority: int):
+        update_shed.inc(priority=PRIORITY_NAMES[priority])
         try:
-            member = await bot.get_chat_member(chat_id=channel, user_id=user_id)
-            if member.status not in ("member", "administrator", "creator"):
-                return False
+            if isinstance(event, (Message, CallbackQuery)):
+                await event.answer(BUSY_TEXT)
+        except (TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter):
+            pass
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        priority = self.classify(event)
+        sheddable = priority == PRIORITY_OTHER
+        if sheddable and self.overloaded():
+            await self.shed(event, priority)
+            return None
+        started = time.perf_counter()
+        if sheddable:
+            admitted = await self.gate.acquire(priority, UPDATE_SHED_WAIT, UPDATE_SHED_DEPTH)
+        else:
+            admitted = await self.gate.acquire(priority)
+        if not admitted:
+            await self.shed(event, priority)
+            return None
+        update_wait.observe(time.perf_counter() - started, priority=PRIORITY_NAMES[priority])
+        try:
+            return await handler(event, data)
+        finally:
+            self.gate.release(priority)
+
+update_gate = UpdateGate(UPDATE_CONCURRENCY, (UPDATE_CONCURRENCY, UPDATE_CONCURRENCY_ADMIN, UPDATE_CONCURRENCY_OTHER))
+load_shedding = LoadSheddingMiddleware(update_gate)
+dp.message.outer_middleware(load_shedding)
+dp.callback_query.outer_middleware(load_shedding)
+dp.inline_query.outer_middleware(load_shedding)
+# chat_member navbatga qo'yilmaydi: handler faqat xotiradagi keshni yangilaydi, tashlab
+# yuborilsa a'zolik keshi eskirib qoladi
+
+# Event loop kechikishi: uxlash belgilangan vaqtdan qanchaga kech tugagani
+LOOP_LAG_INTERVAL = 0.1
+
+async def monitor_loop_lag():
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        load_shedding.observe_lag(time.perf_counter() - started - LOOP_LAG_INTERVAL)
+
+# Barcha tugmalar bitta jadval orqali: marshrut bir marta topiladi, payload parse qilinib
+# handlerga argument sifatida beriladi. callback_router.handle - yagona callback_query handleri.
+callback_router = CallbackRouter()
+dp.callback_query.outer_middleware(callback_router)
+dp.callback_query.register(callback_router.handle)
+
+# "<poll_id>_<qolgan qism>" ko'rinishidagi payload (eksport formati, eski ovoz tugmalari)
+def split_pair(value: str) -> Tuple[str, str]:
+    poll_id, _, rest = value.partition("_")
+    return parse_poll_id(poll_id), rest
+
+# Metrikalar: handlerlar va Bot API chaqiruvlari vaqti, xatolar, navbatlar
+metrics = MetricsRegistry()
+handler_latency = metrics.histogram("bot_handler_duration_seconds", "Handler bajarilish vaqti")
+handler_errors = metrics.counter("bot_handler_errors_total", "Handlerdagi xatolar soni")
+api_latency = metrics.histogram("bot_api_request_duration_seconds", "Bot API so'rovlari vaqti")
+api_errors = metrics.counter("bot_api_errors_total", "Bot API xatolari soni")
+http_phase_latency = metrics.histogram("bot_http_phase_seconds", "Bot API HTTP so'rovi bosqichlari vaqti")
+http_connections = metrics.counter("bot_http_connections_total", "Yangi va qayta ishlatilgan ulanishlar")
+update_wait = metrics.histogram("bot_update_queue_wait_seconds", "Update'ning navbatda kutish vaqti")
+update_shed = metrics.counter("bot_updates_shed_total", "Yuklama sababli rad etilgan update'lar")
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback_route = data.get("callback_route")
+        if callback_route is not None:
+            name = callback_route[0].name
+        else:
+            name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
         except Exception as e:
-            logging.error(f"Kanalga a'zolikni tekshirishda xato: {e}")
-            return False
-    return True
+            handler_errors.inc(handler=name, error=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            handler_latency.observe(elapsed, handler=name)
+            if SLOW_UPDATE_THRESHOLD and elapsed > SLOW_UPDATE_THRESHOLD:
+                user = getattr(event, "from_user", None)
+                logging.warning(
+                    f"Sekin update: {name} {elapsed:.2f} s (foydalanuvchi: {user.id if user else '-'})"
+                )
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            api_errors.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            api_latency.observe(time.perf_counter() - started, method=name)
+
+handler_metrics = HandlerMetricsMiddleware()
+dp.message.middleware(handler_metrics)
+dp.callback_query.middleware(handler_metrics)
+dp.chat_member.middleware(handler_metrics)
+dp.inline_query.middleware(handler_metrics)
+api_metrics = ApiMetricsMiddleware()
+bot.session.middleware(api_metrics)
+broadcast_bot.session.middleware(api_metrics)
+
+metrics.gauge("bot_users", "Foydalanuvchilar soni", lambda: len(users))
+metrics.gauge("bot_polls", "So'rovnomalar soni", lambda: len(polls))
+metrics.gauge("bot_active_polls", "Faol so'rovnomalar soni", lambda: len(active_poll_ids))
+metrics.gauge("bot_votes", "Jami ovozlar", lambda: bot_counters["total_votes"])
+metrics.gauge("bot_event_loop_lag_seconds", "Event loop kechikishi", lambda: load_shedding.loop_lag)
+metrics.labeled_gauge("bot_member_cache", "A'zolik keshi", lambda: {
+    "entries": len(member_cache), "inflight": len(member_inflight), **member_cache_stats
+}, "kind")
+metrics.labeled_gauge("bot_queue_depth", "Navbatlar uzunligi", lambda: {
+    "storage_pending": len(storage.pending),
+    "vote_journal_buffer": len(vote_journal.buffer),
+    "admin_digest": len(digest_buffer),
+    "live_updates": len(live_update_tasks),
+    "background_tasks": len(background_tasks),
+    "throttle_entries": len(throttling.hits),
+    "scheduled_jobs": len(scheduler.jobs),
+    **{f"updates_{name}": update_gate.queued[i] for i, name in enumerate(PRIORITY_NAMES)}
+}, "queue")
+metrics.labeled_gauge("bot_updates_active", "Ishlayotgan handlerlar soni", lambda: {
+    name: update_gate.active[i] for i, name in enumerate(PRIORITY_NAMES)
+}, "priority")
+metrics.labeled_gauge("bot_broadcast", "Joriy xabarnoma holati", lambda: {
+    "total": len(current_broadcast.recipients),
+    "cursor": current_broadcast.cursor,
+    "success": current_broadcast.state['success'],
+    "failed": current_broadcast.state['failed'],
+    "in_flight": len(current_broadcast.in_flight)
+} if current_broadcast is not None else {}, "field")
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+async def start_metrics_server():
+    if not METRICS_PORT:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=METRICS_HOST, port=METRICS_PORT).start()
+    except OSError as e:
+        logging.error(f"Metrikalar serverini ishga tushirishda xato: {e}")
+        await runner.cleanup()
+        return
+    logging.info(f"Metrikalar http://{METRICS_HOST}:{METRICS_PORT}/metrics da")
 
 # Holatlar (States)
 class PollState(StatesGroup):
     waiting_for_title = State()
     waiting_for_image = State()
     waiting_for_options = State()
+    waiting_for_kind = State()
 
 class AdminState(StatesGroup):
     waiting_for_new_admin_id = State()
@@ -51,11 +613,167 @@ class ChannelState(StatesGroup):
 class AnnouncementState(StatesGroup):
     waiting_for_announcement = State()
 
-# Ma'lumotlar bazasi (vaqtincha)
+class LiveResultsState(StatesGroup):
+    waiting_for_chat = State()
+
+class ScheduleState(StatesGroup):
+    waiting_for_poll_times = State()
+
+# Ma'lumotlar bazasi (SQLite) va uning xotiradagi keshi
+storage = SqlitePollRepository(DB_PATH, flush_interval=STORAGE_FLUSH_INTERVAL)
+vote_journal = VoteJournal(VOTE_JOURNAL_PATH, commit_interval=VOTE_JOURNAL_COMMIT_INTERVAL)
+scheduler = Scheduler(storage)
 polls: Dict[str, Dict] = {}
-votes: Dict[str, Set[int]] = {}
-user_polls: Dict[int, List[str]] = {}
-users: Set[int] = set()
+votes: Dict[str, IdSet] = {}
+# Muallif bo'yicha indeks: filtr -> yaratilish tartibida (o'sish bo'yicha) so'rovnoma ID lari
+POLL_FILTERS = {"all": "Barchasi", "active": "Faol", "closed": "Yakunlangan"}
+creator_poll_index: Dict[int, Dict[str, List[int]]] = {}
+users = IdSet()
+
+# Auditoriya segmentlari. Botni bloklaganlar xabarnomalardan chiqariladi; faollik kunlar
+# bo'yicha saqlanadi, shuning uchun "so'nggi N kun" segmenti butun bazani ko'rib chiqmaydi.
+inactive_users: Set[int] = set()
+subscribed_users: Set[int] = set()
+activity_days: Dict[int, IdSet] = {}
+
+def prune_activity_days(today: int):
+    for day in [d for d in activity_days if d <= today - AUDIENCE_RECENT_DAYS]:
+        del activity_days[day]
+
+def mark_user_seen(user_id: int):
+    if user_id not in users:
+        return
+    if user_id in inactive_users:
+        inactive_users.discard(user_id)
+        storage.set_user_active(user_id, True)
+    now = time.time()
+    today = int(now // 86400)
+    seen_today = activity_days.get(today)
+    if seen_today is None:
+        prune_activity_days(today)
+        seen_today = activity_days[today] = IdSet()
+    if user_id not in seen_today:
+        seen_today.add(user_id)
+        storage.touch_user(user_id, now)
+
+def mark_user_inactive(user_id: int):
+    if user_id not in inactive_users:
+        inactive_users.add(user_id)
+        storage.set_user_active(user_id, False)
+
+def set_user_subscribed(user_id: int, is_subscribed: bool):
+    if user_id not in users or (user_id in subscribed_users) == is_subscribed:
+        return
+    if is_subscribed:
+        subscribed_users.add(user_id)
+    else:
+        subscribed_users.discard(user_id)
+    storage.set_user_subscribed(user_id, is_subscribed)
+
+# Ovoz berganlar ro'yxati birinchi murojaatda bazadan yuklanadi
+async def get_voters(poll_id: str) -> IdSet:
+    voters = votes.get(poll_id)
+    if voters is None:
+        loaded = await storage.load_voters(poll_id)
+        if poll_id not in polls:
+            return loaded
+        voters = votes.setdefault(poll_id, loaded)
+    return voters
+
+# Ovoz bergan foydalanuvchilar (byulletenlar) soni; poll['votes'] esa variantlar
+# bo'yicha hisob (array, indeks - variant tartib raqami)
+def poll_vote_count(poll: Dict) -> int:
+    return poll['ballots']
+
+# Byulletendagi qaysi tanlovlar variantlar hisobiga qo'shiladi: bir nechta variantli
+# so'rovnomada hammasi, afzallik bo'yicha so'rovnomada faqat birinchi tanlov
+def counted_choices(poll: Dict, choices: Sequence[int]) -> Sequence[int]:
+    return choices if poll['kind'] == "multi" else choices[:1]
+
+# Afzallik bo'yicha so'rovnomalarning byulletenlari (byulleten -> soni), birinchi murojaatda yuklanadi
+ranked_ballots: Dict[str, Dict[bytes, int]] = {}
+
+async def get_ranked_ballots(poll_id: str) -> Dict[bytes, int]:
+    ballots = ranked_ballots.get(poll_id)
+    if ballots is None:
+        loaded = await storage.load_ballots(poll_id)
+        if poll_id not in polls:
+            return loaded
+        ballots = ranked_ballots.setdefault(poll_id, loaded)
+    return ballots
+
+# Har bir so'rovnoma uchun so'nggi 24 soatdagi ovozlar dinamikasi
+poll_timelines: Dict[str, VoteTimeline] = {}
+
+def get_timeline(poll_id: str) -> VoteTimeline:
+    timeline = poll_timelines.get(poll_id)
+    if timeline is None:
+        timeline = poll_timelines[poll_id] = VoteTimeline(len(polls[poll_id]['options']))
+    return timeline
+
+def rebuild_timelines(since: float):
+    for poll_id, option_index, ballot, voted_at in storage.iter_votes_since(since):
+        poll = polls.get(poll_id)
+        if poll is None:
+            continue
+        for choice in counted_choices(poll, ballot or (option_index,)):
+            if 0 <= choice < len(poll['options']):
+                get_timeline(poll_id).record(choice, voted_at)
+
+# Bot statistikasi uchun bosqichma-bosqich yangilanadigan hisoblagichlar
+bot_counters = {"total_votes": 0}
+# So'rovnomalar tartibi (yaratilish bo'yicha) faqat yaratish/o'chirishda qayta quriladi
+poll_order: Optional[List[str]] = None
+
+def invalidate_poll_order():
+    global poll_order
+    poll_order = None
+
+def get_poll_order() -> List[str]:
+    global poll_order
+    if poll_order is None:
+        poll_order = list(polls)
+    return poll_order
+
+async def load_storage():
+    global users
+    await storage.open()
+    replayed = await vote_journal.replay(storage)
+    if replayed:
+        logging.info(f"Ovozlar jurnalidan {replayed} ta yozuv tiklandi")
+    await vote_journal.open()
+    polls.update(await storage.load_polls())
+    users = await storage.load_users()
+    inactive_users.update(await storage.load_inactive_users())
+    subscribed_users.update(await storage.load_subscribed_users())
+    for user_id, last_seen in await storage.load_recent_users(time.time() - AUDIENCE_RECENT_DAYS * 86400):
+        activity_days.setdefault(int(last_seen // 86400), IdSet()).add(user_id)
+    admin_notify_modes.update(await storage.load_admin_notify_modes())
+    live_messages.update(await storage.load_live_messages())
+    for poll_id, poll in polls.items():
+        index_creator_poll(poll_id, poll)
+        set_poll_active_index(poll_id, poll.get('is_active', True))
+        bot_counters["total_votes"] += poll_vote_count(poll)
+    invalidate_poll_order()
+    await asyncio.to_thread(rebuild_timelines, time.time() - VoteTimeline.HOURS * 3600)
+    await scheduler.load()
+    logging.info(f"Bazadan {len(polls)} ta so'rovnoma va {len(users)} ta foydalanuvchi yuklandi")
+
+async def close_storage():
+    await scheduler.stop()
+    await vote_journal.close()
+    await vote_journal.checkpoint(storage)
+    await storage.close()
+    await dp.storage.close()
+
+# Jurnaldagi ovozlar vaqti-vaqti bilan bazaga ko'chirilib, jurnal bo'shatiladi
+async def checkpoint_vote_journal():
+    while True:
+        await asyncio.sleep(VOTE_JOURNAL_CHECKPOINT_INTERVAL)
+        try:
+            await vote_journal.checkpoint(storage)
+        except Exception as e:
+            logging.error(f"Ovozlar jurnalini bazaga ko'chirishda xato: {e}")
 
 # Admin paneli tugmalari
 admin_keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -68,14 +786,82 @@ admin_keyboard = InlineKeyboardMarkup(inline_keyboard=[
     [
         InlineKeyboardButton(text="Xabarnoma", callback_data="announcement"),
         InlineKeyboardButton(text="Statistika", callback_data="stats")
-    ]
+    ],
+    [InlineKeyboardButton(text="Bildirishnomalar", callback_data="notify_settings")]
 ])
 
-# Start komandasi
+# Faol so'rovnomalar indeksi. Yaratish, faollashtirish, yakunlash va o'chirish
+# uni yangilaydi; tayyor sahifalar indeks o'zgarguncha keshda saqlanadi.
+active_poll_ids: Dict[str, None] = {}
+active_poll_order: Optional[List[str]] = None
+active_polls_markup_cache: Dict[int, InlineKeyboardMarkup] = {}
+# Inline qidiruv faqat faol so'rovnomalar bo'yicha; tayyor natijalar shu yerda almashtiriladi
+poll_search_index = PollSearchIndex()
+inline_results: Dict[str, InlineQueryResultArticle] = {}
+
+def set_poll_active_index(poll_id: str, is_active: bool):
+    global active_poll_order
+    if is_active == (poll_id in active_poll_ids):
+        return
+    if is_active:
+        active_poll_ids[poll_id] = None
+        poll_search_index.add(int(poll_id), polls[poll_id]['title'])
+    else:
+        del active_poll_ids[poll_id]
+        poll_search_index.remove(int(poll_id))
+    inline_results.pop(poll_id, None)
+    active_poll_order = None
+    active_polls_markup_cache.clear()
+
+def active_polls_page_count() -> int:
+    return max(1, -(-len(active_poll_ids) // START_PAGE_SIZE))
+
+def get_active_polls_markup(page: int) -> InlineKeyboardMarkup:
+    global active_poll_order
+    page = min(max(page, 0), active_polls_page_count() - 1)
+    markup = active_polls_markup_cache.get(page)
+    if markup is not None:
+        return markup
+    
+    if active_poll_order is None:
+        active_poll_order = list(active_poll_ids)
+    start_index = page * START_PAGE_SIZE
+    kb = InlineKeyboardBuilder()
+    for poll_id in active_poll_order[start_index:start_index + START_PAGE_SIZE]:
+        kb.row(InlineKeyboardButton(text=polls[poll_id]['title'], callback_data=f"vote_{poll_id}"))
+    pages = active_polls_page_count()
+    if pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"active_page_{page - 1}"))
+        nav.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data=f"active_page_{page}"))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton(text="➡️", callback_data=f"active_page_{page + 1}"))
+        kb.row(*nav)
+    markup = active_polls_markup_cache[page] = kb.as_markup()
+    return markup
+
+def index_creator_poll(poll_id: str, poll: Dict, deleted: bool = False):
+    lists = creator_poll_index.setdefault(poll['creator'], {name: [] for name in POLL_FILTERS})
+    key = int(poll_id)
+    status = "active" if poll.get('is_active', True) else "closed"
+    for name, ids in lists.items():
+        wanted = not deleted and name in ("all", status)
+        index = bisect.bisect_left(ids, key)
+        present = index < len(ids) and ids[index] == key
+        if wanted and not present:
+            ids.insert(index, key)
+        elif present and not wanted:
+            del ids[index]
+
+# Start komandasi. "/start poll_<id>" - inline rejimda ulashilgan so'rovnoma havolasi
 @dp.message(CommandStart())
-async def start(message: Message):
+async def start(message: Message, command: CommandObject):
     user_id = message.from_user.id
-    users.add(user_id)
+    if user_id not in users:
+        users.add(user_id)
+        storage.add_user(user_id)
+        mark_user_seen(user_id)
     
     # Kanalga a'zolikni tekshirish
     is_subscribed = await check_channel_subscription(user_id)
@@ -92,21 +878,40 @@ async def start(message: Message):
         )
         return
     
+    if command.args and command.args.startswith("poll_"):
+        poll_id = command.args[len("poll_"):]
+        poll = polls.get(poll_id)
+        if not poll or not poll_is_open(poll_id, poll):
+            await message.answer("So'rovnoma topilmadi yoki yakunlangan")
+        elif user_id in await get_voters(poll_id):
+            await message.answer("Siz allaqachon ovoz bergansiz!")
+        else:
+            await send_vote_prompt(message, poll_id, poll)
+        return
+    
     # Admin yoki oddiy foydalanuvchi tekshiruvi
     if user_id in ADMIN_IDS:
         await message.answer("Admin paneliga xush kelibsiz!", reply_markup=admin_keyboard)
     else:
-        active_polls = {pid: p for pid, p in polls.items() if p.get('is_active', True)}
-        if not active_polls:
+        if not active_poll_ids:
             await message.answer("Hozircha faol so'rovnomalar mavjud emas.")
         else:
-            kb = InlineKeyboardBuilder()
-            for poll_id, poll in active_polls.items():
-                kb.button(text=poll['title'], callback_data=f"vote_{poll_id}")
-            await message.answer("Faol so'rovnomalar:", reply_markup=kb.as_markup())
+            await message.answer("Faol so'rovnomalar:", reply_markup=get_active_polls_markup(0))
+
+@callback_router.route("active_page_", parse=int)
+async def active_polls_page(call: CallbackQuery, page: int):
+    if not active_poll_ids:
+        await call.answer("Hozircha faol so'rovnomalar mavjud emas.", show_alert=True)
+        return
+    
+    try:
+        await call.message.edit_reply_markup(reply_markup=get_active_polls_markup(page))
+    except TelegramBadRequest:
+        pass
+    await call.answer()
 
 # Yangi so'rovnoma yaratish
-@dp.callback_query(F.data == "new_poll")
+@callback_router.route("new_poll")
 async def create_poll_start(call: CallbackQuery, state: FSMContext):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
@@ -151,32 +956,121 @@ async def get_options(message: Message, state: FSMContext):
         await message.answer("Variantlar soni 10 tadan ko'p bo'lmasligi kerak!")
         return
     
+    await state.update_data(options=options)
+    kb = InlineKeyboardBuilder()
+    for kind, label in POLL_KIND_LABELS.items():
+        kb.button(text=label, callback_data=f"poll_kind_{kind}")
+    kb.adjust(1)
+    await message.answer("So'rovnoma turini tanlang:", reply_markup=kb.as_markup())
+    await state.set_state(PollState.waiting_for_kind)
+
+POLL_KIND_LABELS = {
+    "single": "Bitta variant",
+    "multi": "Bir nechta variant",
+    "ranked": "Afzallik tartibi (instant-runoff)",
+}
+
+@callback_router.route("poll_kind_", state=PollState.waiting_for_kind)
+async def get_poll_kind(call: CallbackQuery, kind: str, state: FSMContext):
+    if kind not in POLL_KINDS:
+        await call.answer()
+        return
+    
     data = await state.get_data()
-    poll_id = str(len(polls) + 1)
-    creator_id = message.from_user.id
+    options = data['options']
+    poll_id = await storage.allocate_poll_id()
+    creator_id = call.from_user.id
     
-    polls[poll_id] = {
+    poll = {
         'title': data['title'],
         'image': data.get('image'),
         'options': options,
-        'votes': {opt: 0 for opt in options},
+        'kind': kind,
+        'votes': new_tally(len(options)),
+        'ballots': 0,
         'creator': creator_id,
         'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
         'is_active': True
     }
-    votes[poll_id] = set()
-    
-    if creator_id not in user_polls:
-        user_polls[creator_id] = []
-    user_polls[creator_id].append(poll_id)
-    
-    await message.answer(f"So'rovnoma muvaffaqiyatli yaratildi! ID: {poll_id}")
+    # So'rovnoma ovoz qabul qilishdan oldin diskka yoziladi: jurnaldagi ovozlar qayta
+    # tiklanganda faqat bazada bor so'rovnomalarga yoziladi
+    storage.save_poll(poll_id, poll)
+    try:
+        await storage.checkpoint()
+    except Exception as e:
+        logging.error(f"So'rovnoma {poll_id} ni diskka yozishda xato: {e}")
+    polls[poll_id] = poll
+    votes[poll_id] = IdSet()
+    set_poll_active_index(poll_id, True)
+    invalidate_poll_order()
+    index_creator_poll(poll_id, polls[poll_id])
+    
+    await call.message.answer(f"So'rovnoma muvaffaqiyatli yaratildi! ID: {poll_id}")
     await state.clear()
+    await call.answer()
+
+# Ovoz tugmasi uchun ixcham callback_data: "s:<poll_id>:<variant indeksi>"
+class SelectOption(CallbackData, prefix="s"):
+    poll_id: int
+    option: int
+
+# Har bir so'rovnoma uchun ovoz klaviaturasi bir marta quriladi
+vote_keyboards: Dict[str, InlineKeyboardMarkup] = {}
+
+def get_vote_keyboard(poll_id: str) -> InlineKeyboardMarkup:
+    markup = vote_keyboards.get(poll_id)
+    if markup is None:
+        kb = InlineKeyboardBuilder()
+        for index, opt in enumerate(polls[poll_id]['options']):
+            kb.button(text=opt, callback_data=SelectOption(poll_id=int(poll_id), option=index))
+        kb.adjust(1)
+        markup = vote_keyboards[poll_id] = kb.as_markup()
+    return markup
+
+# Bir nechta variantli va afzallik bo'yicha so'rovnomalarda tanlov tugmalarning o'zida
+# saqlanadi: "b:<poll_id>:<tanlangan indekslar>:<bosilgan variant>", masalan "b:12:203:1"
+class BallotOption(CallbackData, prefix="b"):
+    poll_id: int
+    # Hech narsa tanlanmaganda bo'sh maydon unpack paytida None bo'lib keladi
+    picked: Optional[str] = None
+    option: int
+
+BALLOT_SUBMIT = -1
+BALLOT_RESET = -2
+
+BALLOT_HINTS = {
+    "multi": "Bir yoki bir nechta variantni belgilab, \"Yuborish\" tugmasini bosing.",
+    "ranked": "Variantlarni afzallik tartibida bosing (birinchisi - eng ma'quli), so'ng \"Yuborish\" tugmasini bosing.",
+}
+
+def get_ballot_keyboard(poll_id: str, picked: List[int]) -> InlineKeyboardMarkup:
+    poll = polls[poll_id]
+    state = "".join(map(str, picked))
+    kb = InlineKeyboardBuilder()
+    for index, opt in enumerate(poll['options']):
+        if index in picked:
+            mark = f"{picked.index(index) + 1}." if poll['kind'] == "ranked" else "✅"
+            text = f"{mark} {opt}"
+        else:
+            text = opt
+        kb.row(InlineKeyboardButton(
+            text=text, callback_data=BallotOption(poll_id=int(poll_id), picked=state, option=index).pack()
+        ))
+    kb.row(
+        InlineKeyboardButton(text="↩️ Tozalash", callback_data=BallotOption(
+            poll_id=int(poll_id), option=BALLOT_RESET).pack()),
+        InlineKeyboardButton(text="📨 Yuborish", callback_data=BallotOption(
+            poll_id=int(poll_id), picked=state, option=BALLOT_SUBMIT).pack())
+    )
+    return kb.as_markup()
+
+# So'rovnoma o'zgarganda unga tegishli keshlarni tozalash
+def invalidate_poll_caches(poll_id: str):
+    vote_keyboards.pop(poll_id, None)
 
 # So'rovnomada ovoz berish
-@dp.callback_query(F.data.startswith("vote_"))
-async def vote_handler(call: CallbackQuery):
-    poll_id = call.data.split("_")[1]
+@callback_router.route("vote_", parse=parse_poll_id)
+async def vote_handler(call: CallbackQuery, poll_id: str):
     user_id = call.from_user.id
     
     is_subscribed = await check_channel_subscription(user_id)
@@ -184,91 +1078,349 @@ async def vote_handler(call: CallbackQuery):
         await call.answer("Avval kanal(lar)ga obuna bo'ling!", show_alert=True)
         return
     
-    if user_id in votes.get(poll_id, set()):
-        await call.answer("Siz allaqachon ovoz bergansiz!", show_alert=True)
-        return
-    
     poll = polls.get(poll_id)
     if not poll or not poll.get('is_active', True):
         await call.answer("So'rovnoma topilmadi yoki yakunlangan", show_alert=True)
         return
     
-    kb = InlineKeyboardBuilder()
-    for opt in poll['options']:
-        kb.button(text=opt, callback_data=f"select_{poll_id}_{opt}")
-    kb.adjust(1)
+    if user_id in await get_voters(poll_id):
+        await call.answer("Siz allaqachon ovoz bergansiz!", show_alert=True)
+        return
     
+    await send_vote_prompt(call.message, poll_id, poll)
+    await call.answer()
+
+async def send_vote_prompt(message: Message, poll_id: str, poll: Dict):
+    kind = poll['kind']
+    if kind == "single":
+        markup = get_vote_keyboard(poll_id)
+        title = poll['title']
+    else:
+        markup = get_ballot_keyboard(poll_id, [])
+        title = f"{poll['title']}\n\n{BALLOT_HINTS[kind]}"
     if poll.get('image'):
-        await call.message.answer_photo(
+        await message.answer_photo(
             photo=poll['image'],
-            caption=poll['title'],
-            reply_markup=kb.as_markup()
+            caption=title,
+            reply_markup=markup
         )
     else:
-        await call.message.answer(
-            poll['title'],
-            reply_markup=kb.as_markup()
+        await message.answer(
+            title,
+            reply_markup=markup
         )
+
+# Inline rejim: "@bot <qidiruv>" faol so'rovnomani istalgan chatga ulashadi. Har bir
+# so'rovnoma uchun natija bir marta quriladi va holati o'zgarguncha qayta ishlatiladi.
+# Natijalar hamma uchun bir xil (is_personal=False), shuning uchun Telegram bir xil
+# qidiruvni boshqa foydalanuvchilarga ham keshdan beradi va har bir harf botga kelmaydi.
+def get_inline_result(poll_id: str, bot_username: str) -> InlineQueryResultArticle:
+    result = inline_results.get(poll_id)
+    if result is not None:
+        return result
+    
+    poll = polls[poll_id]
+    options = "\n".join(f"▫️ {html.escape(option, quote=False)}" for option in poll['options'])
+    result = inline_results[poll_id] = InlineQueryResultArticle(
+        id=poll_id,
+        title=poll['title'],
+        description=f"{POLL_KIND_LABELS[poll['kind']]}, {len(poll['options'])} ta variant",
+        input_message_content=InputTextMessageContent(
+            message_text=f"📊 <b>{html.escape(poll['title'], quote=False)}</b>\n\n{options}\n\nOvoz berish uchun tugmani bosing."
+        ),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(
+            text="🗳 Ovoz berish", url=f"https://t.me/{bot_username}?start=poll_{poll_id}"
+        )]])
+    )
+    return result
+
+@dp.inline_query()
+async def share_poll_inline(query: InlineQuery):
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    poll_ids, next_offset = poll_search_index.search(query.query, offset)
+    me = await bot.me()
+    await query.answer(
+        [get_inline_result(str(poll_id), me.username) for poll_id in poll_ids],
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=str(next_offset) if next_offset is not None else ""
+    )
+
+@callback_router.route(SelectOption)
+async def select_option(call: CallbackQuery, callback_data: SelectOption):
+    await record_vote(call, str(callback_data.poll_id), [callback_data.option])
+
+@callback_router.route(BallotOption)
+async def ballot_option(call: CallbackQuery, callback_data: BallotOption):
+    poll_id = str(callback_data.poll_id)
+    poll = polls.get(poll_id)
+    if not poll or poll['kind'] == "single" or not poll_is_open(poll_id, poll):
+        await call.answer("So'rovnoma topilmadi yoki yakunlangan", show_alert=True)
+        return
+    
+    picked = [int(digit) for digit in callback_data.picked or "" if digit.isdigit()]
+    option = callback_data.option
+    if option == BALLOT_SUBMIT:
+        if not picked:
+            await call.answer("Kamida bitta variantni tanlang!", show_alert=True)
+            return
+        await record_vote(call, poll_id, picked)
+        return
+    
+    if option == BALLOT_RESET:
+        picked = []
+    elif option in picked:
+        picked.remove(option)
+    elif 0 <= option < len(poll['options']):
+        picked.append(option)
+    try:
+        await call.message.edit_reply_markup(reply_markup=get_ballot_keyboard(poll_id, picked))
+    except TelegramBadRequest:
+        pass
     await call.answer()
 
-@dp.callback_query(F.data.startswith("select_"))
-async def select_option(call: CallbackQuery):
-    _, poll_id, selected = call.data.split("_", 2)
+# Eski formatdagi ("select_<poll_id>_<variant matni>") tugmalar uchun
+@callback_router.route("select_", parse=split_pair)
+async def select_option_legacy(call: CallbackQuery, payload: Tuple[str, str]):
+    poll_id, selected = payload
+    poll = polls.get(poll_id)
+    option_index = poll['options'].index(selected) if poll and selected in poll['options'] else -1
+    await record_vote(call, poll_id, [option_index])
+
+def describe_ballot(poll: Dict, choices: Sequence[int]) -> str:
+    separator = " > " if poll['kind'] == "ranked" else ", "
+    return separator.join(poll['options'][choice] for choice in choices)
+
+async def record_vote(call: CallbackQuery, poll_id: str, choices: List[int]):
     user_id = call.from_user.id
     
-    if user_id in votes.get(poll_id, set()):
+    poll = polls.get(poll_id)
+    if not poll or not poll_is_open(poll_id, poll) or not is_valid_ballot(
+        poll['kind'], choices, len(poll['options'])
+    ):
+        await call.answer("So'rovnoma topilmadi yoki yakunlangan", show_alert=True)
+        return
+    selected = describe_ballot(poll, choices)
+    # Bitta variantli ovozlar uchun byulleten saqlanmaydi, option_index yetarli
+    ballot = encode_ballot(choices) if poll['kind'] != "single" else None
+    
+    voters = await get_voters(poll_id)
+    if user_id in voters:
         await call.answer("Siz allaqachon ovoz bergansiz!", show_alert=True)
         return
+    ranked = await get_ranked_ballots(poll_id) if poll['kind'] == "ranked" else None
     
-    poll = polls.get(poll_id)
-    if not poll or not poll.get('is_active', True):
+    # Bazadan yuklash paytida so'rovnoma o'chirilgan yoki yakunlangan bo'lishi mumkin.
+    # Tekshiruv va hisoblagichni oshirish orasida await yo'q, shuning uchun taymer
+    # so'rovnomani ovoz yarim yo'lda turganida yopa olmaydi.
+    if polls.get(poll_id) is not poll or not poll_is_open(poll_id, poll):
         await call.answer("So'rovnoma topilmadi yoki yakunlangan", show_alert=True)
         return
+    if user_id in voters:
+        await call.answer("Siz allaqachon ovoz bergansiz!", show_alert=True)
+        return
     
-    poll['votes'][selected] += 1
-    votes[poll_id].add(user_id)
+    voted_at = time.time()
+    timeline = get_timeline(poll_id)
+    for choice in counted_choices(poll, choices):
+        poll['votes'][choice] += 1
+        timeline.record(choice, voted_at)
+    if ranked is not None:
+        ranked[ballot] = ranked.get(ballot, 0) + 1
+    poll['ballots'] += 1
+    voters.add(user_id)
+    bot_counters["total_votes"] += 1
+    schedule_live_update(poll_id)
+    storage.add_vote(poll_id, user_id, choices[0], voted_at, ballot)
+    try:
+        await vote_journal.append(poll_id, user_id, choices[0], voted_at, ballot)
+    except Exception as e:
+        logging.error(f"Ovozni jurnalga yozishda xato: {e}")
     
     await call.answer(f"Siz {selected} uchun ovoz berdingiz!", show_alert=True)
     
     if call.from_user.id not in ADMIN_IDS:
+        notify_admins_about_vote(call.from_user.full_name, user_id, poll_id, selected)
+
+# Ovoz bildirishnomalari: realtime adminlarga darhol, digest adminlarga
+# har ADMIN_DIGEST_INTERVAL soniyada bitta umumiy xabar yuboriladi
+NOTIFY_MODES = {
+    "realtime": "Har bir ovoz",
+    "digest": "Umumiy hisobot",
+    "off": "O'chirilgan"
+}
+admin_notify_modes: Dict[int, str] = {}
+digest_buffer: Dict[str, int] = {}
+
+def get_admin_notify_mode(admin_id: int) -> str:
+    return admin_notify_modes.get(admin_id, ADMIN_NOTIFY_DEFAULT_MODE)
+
+async def send_admin_notification(admin_id: int, text: str):
+    try:
+        await bot.send_message(admin_id, text)
+    except Exception as e:
+        logging.error(f"Adminga xabar yuborishda xato: {e}")
+
+def notify_admins_about_vote(full_name: str, user_id: int, poll_id: str, selected: str):
+    poll = polls[poll_id]
+    modes = {admin_id: get_admin_notify_mode(admin_id) for admin_id in ADMIN_IDS}
+    if "digest" in modes.values():
+        digest_buffer[poll_id] = digest_buffer.get(poll_id, 0) + 1
+    for admin_id, mode in modes.items():
+        if mode == "realtime":
+            spawn(send_admin_notification(
+                admin_id,
+                f"Yangi ovoz: {full_name} ({user_id})\n"
+                f"So'rovnoma: {poll['title']}\n"
+                f"Tanlov: {selected}"
+            ))
+
+def render_vote_digest(events: Dict[str, int]) -> Optional[str]:
+    minutes = ADMIN_DIGEST_INTERVAL / 60
+    period = f"{minutes:g} daqiqada" if minutes >= 1 else f"{ADMIN_DIGEST_INTERVAL:g} soniyada"
+    lines = [f"🗳 So'nggi {period}:"]
+    for poll_id, count in events.items():
+        poll = polls.get(poll_id)
+        if not poll:
+            continue
+        tally = poll['votes']
+        leader = poll['options'][max(range(len(tally)), key=tally.__getitem__)]
+        lines.append(f"{poll['title']}: +{count} ovoz, yetakchi: {leader}")
+    return "\n".join(lines) if len(lines) > 1 else None
+
+async def flush_vote_digests():
+    while True:
+        await asyncio.sleep(ADMIN_DIGEST_INTERVAL)
+        if not digest_buffer:
+            continue
+        events = dict(digest_buffer)
+        digest_buffer.clear()
+        text = render_vote_digest(events)
+        if text is None:
+            continue
         for admin_id in ADMIN_IDS:
-            try:
-                await bot.send_message(
-                    admin_id,
-                    f"Yangi ovoz: {call.from_user.full_name} ({call.from_user.id})\n"
-                    f"So'rovnoma: {poll['title']}\n"
-                    f"Tanlov: {selected}"
-                )
-            except Exception as e:
-                logging.error(f"Adminga xabar yuborishda xato: {e}")
+            if get_admin_notify_mode(admin_id) == "digest":
+                await send_admin_notification(admin_id, text)
+
+def notify_settings_keyboard(admin_id: int) -> InlineKeyboardMarkup:
+    current = get_admin_notify_mode(admin_id)
+    kb = InlineKeyboardBuilder()
+    for mode, title in NOTIFY_MODES.items():
+        mark = "✅ " if mode == current else ""
+        kb.button(text=f"{mark}{title}", callback_data=f"notify_mode_{mode}")
+    kb.adjust(1)
+    return kb.as_markup()
+
+@callback_router.route("notify_settings")
+async def notify_settings(call: CallbackQuery):
+    if call.from_user.id not in ADMIN_IDS:
+        await call.answer("Faqat adminlar uchun!", show_alert=True)
+        return
+    
+    await call.message.answer(
+        "Yangi ovozlar haqida bildirishnoma turini tanlang:",
+        reply_markup=notify_settings_keyboard(call.from_user.id)
+    )
+    await call.answer()
+
+@callback_router.route("notify_mode_")
+async def set_notify_mode(call: CallbackQuery, mode: str):
+    if call.from_user.id not in ADMIN_IDS:
+        await call.answer("Faqat adminlar uchun!", show_alert=True)
+        return
+    
+    if mode not in NOTIFY_MODES:
+        await call.answer("Noma'lum rejim", show_alert=True)
+        return
+    
+    admin_notify_modes[call.from_user.id] = mode
+    storage.set_admin_notify_mode(call.from_user.id, mode)
+    try:
+        await call.message.edit_reply_markup(reply_markup=notify_settings_keyboard(call.from_user.id))
+    except TelegramBadRequest:
+        pass
+    await call.answer(f"Bildirishnoma turi: {NOTIFY_MODES[mode]}")
 
 # Mening so'rovnomalarim
-@dp.callback_query(F.data == "my_polls")
+# "Mening so'rovnomalarim" sahifasi: eng yangisi birinchi. Kursor - sahifa chetidagi
+# so'rovnoma ID si, shuning uchun yangi so'rovnoma qo'shilsa ham sahifalar siljimaydi.
+class MyPollsPage(CallbackData, prefix="mp"):
+    status: str = "all"
+    before: int = 0
+    after: int = 0
+
+def render_my_polls(creator_id: int, page: MyPollsPage) -> Tuple[str, InlineKeyboardMarkup]:
+    lists = creator_poll_index.get(creator_id, {})
+    ids = lists.get(page.status, [])
+    if page.after:
+        start_index = bisect.bisect_right(ids, page.after)
+        visible = ids[start_index:start_index + MENU_PAGE_SIZE]
+    else:
+        end_index = bisect.bisect_left(ids, page.before) if page.before else len(ids)
+        visible = ids[max(0, end_index - MENU_PAGE_SIZE):end_index]
+    
+    kb = InlineKeyboardBuilder()
+    for poll_id in reversed(visible):
+        poll = polls[str(poll_id)]
+        status = "✅ Faol" if poll.get('is_active', True) else "❌ Yakunlangan"
+        kb.row(InlineKeyboardButton(text=f"{poll['title']} ({status})", callback_data=f"manage_{poll_id}"))
+    if visible:
+        nav = []
+        if ids[-1] > visible[-1]:
+            nav.append(InlineKeyboardButton(
+                text="⬅️", callback_data=MyPollsPage(status=page.status, after=visible[-1]).pack()
+            ))
+        if ids[0] < visible[0]:
+            nav.append(InlineKeyboardButton(
+                text="➡️", callback_data=MyPollsPage(status=page.status, before=visible[0]).pack()
+            ))
+        if nav:
+            kb.row(*nav)
+    kb.row(*(
+        InlineKeyboardButton(
+            text=f"• {label}" if name == page.status else label,
+            callback_data=MyPollsPage(status=name).pack()
+        )
+        for name, label in POLL_FILTERS.items()
+    ))
+    
+    counts = ", ".join(f"{label}: {len(lists.get(name, []))}" for name, label in POLL_FILTERS.items())
+    text = f"Sizning so'rovnomalaringiz ({counts}):"
+    if not visible:
+        text += "\nBu bo'limda so'rovnomalar yo'q."
+    return text, kb.as_markup()
+
+@callback_router.route("my_polls")
 async def show_my_polls(call: CallbackQuery):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
         return
     
     creator_id = call.from_user.id
-    if creator_id not in user_polls or not user_polls[creator_id]:
+    if not creator_poll_index.get(creator_id, {}).get("all"):
         await call.answer("Siz hali so'rovnoma yaratmadingiz!", show_alert=True)
         return
     
-    kb = InlineKeyboardBuilder()
-    for poll_id in user_polls[creator_id]:
-        if poll_id in polls:
-            poll = polls[poll_id]
-            status = "✅ Faol" if poll.get('is_active', True) else "❌ Yakunlangan"
-            kb.button(text=f"{poll['title']} ({status})", callback_data=f"manage_{poll_id}")
-    kb.adjust(1)
+    text, markup = render_my_polls(creator_id, MyPollsPage())
+    await call.message.answer(text, reply_markup=markup)
+    await call.answer()
+
+@callback_router.route(MyPollsPage)
+async def show_my_polls_page(call: CallbackQuery, callback_data: MyPollsPage):
+    if call.from_user.id not in ADMIN_IDS or callback_data.status not in POLL_FILTERS:
+        await call.answer("Faqat adminlar uchun!", show_alert=True)
+        return
     
-    await call.message.answer("Sizning so'rovnomalaringiz:", reply_markup=kb.as_markup())
+    text, markup = render_my_polls(call.from_user.id, callback_data)
+    try:
+        await call.message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest:
+        pass
     await call.answer()
 
 # So'rovnomani boshqarish
-@dp.callback_query(F.data.startswith("manage_"))
-async def manage_poll(call: CallbackQuery):
-    poll_id = call.data.split("_")[1]
+@callback_router.route("manage_", parse=parse_poll_id)
+async def manage_poll(call: CallbackQuery, poll_id: str):
     poll = polls.get(poll_id)
     
     if not poll:
@@ -281,11 +1433,17 @@ async def manage_poll(call: CallbackQuery):
     
     kb = InlineKeyboardBuilder()
     kb.button(text="📊 Statistikani ko'rish", callback_data=f"stats_{poll_id}")
+    kb.button(text="📌 Jonli natijalar", callback_data=f"live_{poll_id}")
+    kb.button(text="📥 CSV eksport", callback_data=f"export_{poll_id}_csv")
+    kb.button(text="📥 JSONL eksport", callback_data=f"export_{poll_id}_jsonl")
     if poll.get('is_active', True):
         kb.button(text="🚫 Yakunlash", callback_data=f"deactivate_{poll_id}")
     else:
         kb.button(text="✅ Faollashtirish", callback_data=f"activate_{poll_id}")
+    kb.button(text="⏰ Ochilish/yopilish vaqti", callback_data=f"schedule_{poll_id}")
     kb.button(text="🗑 So'rovnomani o'chirish", callback_data=f"delete_{poll_id}")
+    if call.from_user.id in ADMIN_IDS:
+        kb.button(text="📢 Ovoz berganlarga xabarnoma", callback_data=f"audience_poll_{poll_id}")
     kb.adjust(1)
     
     status = "✅ Faol" if poll.get('is_active', True) else "❌ Yakunlangan"
@@ -293,16 +1451,76 @@ async def manage_poll(call: CallbackQuery):
     text_parts = [
         f"So'rovnoma: {poll['title']}",
         f"Holati: {status}",
+        f"Turi: {POLL_KIND_LABELS[poll['kind']]}",
         f"Yaratilgan: {poll.get('created_at', unknown_text)}",
-        f"Ovozlar soni: {len(votes.get(poll_id, set()))}"
+        f"Ovozlar soni: {poll_vote_count(poll)}"
     ]
+    opens_at = scheduler.run_at(f"poll_open:{poll_id}")
+    if opens_at is not None:
+        text_parts.append(f"Ochiladi: {format_schedule_time(opens_at)}")
+    closes_at = scheduler.run_at(f"poll_close:{poll_id}")
+    if closes_at is not None:
+        text_parts.append(f"Yopiladi: {format_schedule_time(closes_at)}")
     await call.message.answer("\n".join(text_parts), reply_markup=kb.as_markup())
     await call.answer()
 
 # So'rovnomani o'chirish/yakunlash/faollashtirish
-@dp.callback_query(F.data.startswith("deactivate_"))
-async def deactivate_poll(call: CallbackQuery):
-    poll_id = call.data.split("_")[1]
+def set_poll_status(poll_id: str, is_active: bool):
+    polls[poll_id]['is_active'] = is_active
+    storage.set_poll_active(poll_id, is_active)
+    set_poll_active_index(poll_id, is_active)
+    index_creator_poll(poll_id, polls[poll_id])
+    schedule_live_update(poll_id)
+
+# So'rovnomalarni belgilangan vaqtda ochish/yopish
+SCHEDULE_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+def format_schedule_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, SCHEDULE_TZ).strftime(SCHEDULE_TIME_FORMAT)
+
+def parse_schedule_time(text: str) -> Optional[float]:
+    text = text.strip()
+    if not text:
+        return None
+    return datetime.strptime(text, SCHEDULE_TIME_FORMAT).replace(tzinfo=SCHEDULE_TZ).timestamp()
+
+# "boshlanish - tugash"; istalgan tomoni bo'sh bo'lishi mumkin
+def parse_schedule_range(text: str) -> Tuple[Optional[float], Optional[float]]:
+    text = text.strip()
+    if text == "-":
+        return None, None
+    start, separator, end = text.partition(" - ")
+    if not separator:
+        if text.startswith("- "):
+            start, end = "", text[2:]
+        elif text.endswith(" -"):
+            start, end = text[:-2], ""
+        else:
+            raise ValueError(text)
+    return parse_schedule_time(start), parse_schedule_time(end)
+
+# Yopilish vaqti o'tgan, lekin taymer hali ishlamagan so'rovnoma ham ovoz qabul qilmaydi
+def poll_is_open(poll_id: str, poll: Dict) -> bool:
+    if not poll.get('is_active', True):
+        return False
+    closes_at = scheduler.run_at(f"poll_close:{poll_id}")
+    return closes_at is None or closes_at > time.time()
+
+def open_scheduled_poll(key: str, payload: Dict):
+    poll_id = payload['poll_id']
+    if poll_id in polls:
+        set_poll_status(poll_id, True)
+
+def close_scheduled_poll(key: str, payload: Dict):
+    poll_id = payload['poll_id']
+    if poll_id in polls:
+        set_poll_status(poll_id, False)
+
+scheduler.register("poll_open", open_scheduled_poll)
+scheduler.register("poll_close", close_scheduled_poll)
+
+@callback_router.route("schedule_", parse=parse_poll_id)
+async def schedule_poll_prompt(call: CallbackQuery, poll_id: str, state: FSMContext):
     poll = polls.get(poll_id)
     
     if not poll:
@@ -313,13 +1531,55 @@ async def deactivate_poll(call: CallbackQuery):
         await call.answer("Bu sizning so'rovnomaningiz emas!", show_alert=True)
         return
     
-    poll['is_active'] = False
-    await call.answer("So'rovnoma yakunlandi!", show_alert=True)
-    await call.message.delete()
+    await state.update_data(poll_id=poll_id)
+    await call.message.answer(
+        "Ochilish va yopilish vaqtlarini kiriting:\n"
+        "2026-01-20 09:00 - 2026-01-21 18:00\n"
+        "Faqat yopilish vaqti uchun: - 2026-01-21 18:00\n"
+        "Jadvalni bekor qilish uchun: -"
+    )
+    await state.set_state(ScheduleState.waiting_for_poll_times)
+    await call.answer()
 
-@dp.callback_query(F.data.startswith("activate_"))
-async def activate_poll(call: CallbackQuery):
-    poll_id = call.data.split("_")[1]
+@dp.message(ScheduleState.waiting_for_poll_times)
+async def schedule_poll(message: Message, state: FSMContext):
+    poll_id = (await state.get_data()).get("poll_id")
+    if poll_id not in polls:
+        await message.answer("So'rovnoma topilmadi.")
+        await state.clear()
+        return
+    
+    try:
+        opens_at, closes_at = parse_schedule_range(message.text or "")
+    except ValueError:
+        await message.answer("Noto'g'ri format. Masalan: 2026-01-20 09:00 - 2026-01-21 18:00")
+        return
+    
+    now = time.time()
+    if (opens_at is not None and opens_at <= now) or (closes_at is not None and closes_at <= now):
+        await message.answer("Vaqt kelajakda bo'lishi kerak.")
+        return
+    if opens_at is not None and closes_at is not None and closes_at <= opens_at:
+        await message.answer("Yopilish vaqti ochilish vaqtidan keyin bo'lishi kerak.")
+        return
+    
+    scheduler.cancel(f"poll_open:{poll_id}")
+    scheduler.cancel(f"poll_close:{poll_id}")
+    lines = []
+    if opens_at is not None:
+        # Ochilish vaqtigacha so'rovnoma yopiq turadi
+        if polls[poll_id].get('is_active', True):
+            set_poll_status(poll_id, False)
+        scheduler.add(f"poll_open:{poll_id}", opens_at, {'poll_id': poll_id})
+        lines.append(f"Ochiladi: {format_schedule_time(opens_at)}")
+    if closes_at is not None:
+        scheduler.add(f"poll_close:{poll_id}", closes_at, {'poll_id': poll_id})
+        lines.append(f"Yopiladi: {format_schedule_time(closes_at)}")
+    await message.answer("\n".join(lines) if lines else "So'rovnoma jadvali bekor qilindi.")
+    await state.clear()
+
+@callback_router.route("deactivate_", parse=parse_poll_id)
+async def deactivate_poll(call: CallbackQuery, poll_id: str):
     poll = polls.get(poll_id)
     
     if not poll:
@@ -330,13 +1590,13 @@ async def activate_poll(call: CallbackQuery):
         await call.answer("Bu sizning so'rovnomaningiz emas!", show_alert=True)
         return
     
-    poll['is_active'] = True
-    await call.answer("So'rovnoma qayta faollashtirildi!", show_alert=True)
+    scheduler.cancel(f"poll_close:{poll_id}")
+    set_poll_status(poll_id, False)
+    await call.answer("So'rovnoma yakunlandi!", show_alert=True)
     await call.message.delete()
 
-@dp.callback_query(F.data.startswith("delete_"))
-async def delete_poll(call: CallbackQuery):
-    poll_id = call.data.split("_")[1]
+@callback_router.route("activate_", parse=parse_poll_id)
+async def activate_poll(call: CallbackQuery, poll_id: str):
     poll = polls.get(poll_id)
     
     if not poll:
@@ -347,21 +1607,13 @@ async def delete_poll(call: CallbackQuery):
         await call.answer("Bu sizning so'rovnomaningiz emas!", show_alert=True)
         return
     
-    creator_id = poll.get('creator')
-    if creator_id in user_polls and poll_id in user_polls[creator_id]:
-        user_polls[creator_id].remove(poll_id)
-    
-    del polls[poll_id]
-    if poll_id in votes:
-        del votes[poll_id]
-    
-    await call.answer("So'rovnoma muvaffaqiyatli o'chirildi!", show_alert=True)
+    scheduler.cancel(f"poll_open:{poll_id}")
+    set_poll_status(poll_id, True)
+    await call.answer("So'rovnoma qayta faollashtirildi!", show_alert=True)
     await call.message.delete()
 
-# So'rovnoma statistikasi
-@dp.callback_query(F.data.startswith("stats_"))
-async def show_poll_stats(call: CallbackQuery):
-    poll_id = call.data.split("_")[1]
+@callback_router.route("delete_", parse=parse_poll_id)
+async def delete_poll(call: CallbackQuery, poll_id: str):
     poll = polls.get(poll_id)
     
     if not poll:
@@ -372,7 +1624,29 @@ async def show_poll_stats(call: CallbackQuery):
         await call.answer("Bu sizning so'rovnomaningiz emas!", show_alert=True)
         return
     
-    total_votes = sum(poll['votes'].values())
+    index_creator_poll(poll_id, poll, deleted=True)
+    del polls[poll_id]
+    bot_counters["total_votes"] -= poll_vote_count(poll)
+    invalidate_poll_order()
+    if poll_id in votes:
+        del votes[poll_id]
+    invalidate_poll_caches(poll_id)
+    set_poll_active_index(poll_id, False)
+    live_messages.pop(poll_id, None)
+    poll_timelines.pop(poll_id, None)
+    ranked_ballots.pop(poll_id, None)
+    scheduler.cancel(f"poll_open:{poll_id}")
+    scheduler.cancel(f"poll_close:{poll_id}")
+    storage.delete_poll(poll_id)
+    
+    await call.answer("So'rovnoma muvaffaqiyatli o'chirildi!", show_alert=True)
+    await call.message.delete()
+
+# So'rovnoma statistikasi
+def render_poll_results(poll_id: str) -> str:
+    poll = polls[poll_id]
+    total_votes = poll_vote_count(poll)
+    kind = poll['kind']
     status = "✅ Faol" if poll.get('is_active', True) else "❌ Yakunlangan"
     unknown_text = "Noma'lum"
     
@@ -383,24 +1657,289 @@ async def show_poll_stats(call: CallbackQuery):
         "Natijalar:"
     ]
     
-    for option, count in poll['votes'].items():
+    if kind == "ranked":
+        stats_text[-1] = "Birinchi tanlovlar:"
+    # Bir nechta variantli so'rovnomada foiz - shu variantni belgilagan ovoz berganlar ulushi
+    for option, count in zip(poll['options'], poll['votes']):
         percentage = (count / total_votes * 100) if total_votes > 0 else 0
         stats_text.append(f"{option}: {count} ovoz ({percentage:.1f}%)")
     
     stats_text.append(f"Jami ovozlar: {total_votes}")
+    ballots = ranked_ballots.get(poll_id) if kind == "ranked" else None
+    if ballots is not None:
+        stats_text.append("")
+        stats_text.extend(render_runoff(poll, ballots))
+    return "\n".join(stats_text)
+
+# Telegram cheklovlari: xabar matni va media izohi (caption) uzunligi
+TEXT_LIMIT = 4096
+CAPTION_LIMIT = 1024
+
+def shorten_text(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+# Afzallik bo'yicha hisob har safar byulletenlardan qaytadan bajariladi. Har bir tur
+# uchun faqat yetakchi va chiqarilgan variant ko'rsatiladi, shunda matn uzunligi
+# variantlar soniga kvadratik emas, chiziqli bog'liq bo'ladi.
+RUNOFF_OPTION_CHARS = 40
+
+def render_runoff(poll: Dict, ballots: Dict[bytes, int]) -> List[str]:
+    options = [shorten_text(option, RUNOFF_OPTION_CHARS) for option in poll['options']]
+    winner, rounds = instant_runoff(ballots, len(options))
+    lines = ["Instant-runoff hisobi:"]
+    for number, (tally, eliminated) in enumerate(rounds, 1):
+        leader = max(range(len(options)), key=lambda index: (tally[index], -index))
+        line = f"{number}-tur: yetakchi {options[leader]} - {tally[leader]}/{sum(tally)}"
+        if eliminated is not None:
+            line += f", chiqarildi {options[eliminated]} - {tally[eliminated]}"
+        lines.append(line)
+    lines.append(f"G'olib: {options[winner]}" if winner is not None else "G'olib aniqlanmadi")
+    return lines
+
+def render_poll_timeline(poll_id: str) -> str:
+    now = time.time()
+    timeline = get_timeline(poll_id)
+    rate, peak, peak_ago, hours, trend = timeline.summary(now)
+    lines = [
+        "Ovozlar dinamikasi (so'nggi 24 soat):",
+        f"Hozirgi tezlik: {rate:.1f} ovoz/daqiqa"
+    ]
+    if peak:
+        lines.append(f"So'nggi soatdagi eng yuqori tezlik: {peak} ovoz/daqiqa ({peak_ago} daqiqa oldin)")
+        last_hour = timeline.option_totals_last_hour(now)
+        lines.append("So'nggi soatda: " + ", ".join(
+            f"{option}: {count}" for option, count in zip(polls[poll_id]['options'], last_hour)
+        ))
+    lines.append(f"Soatlar bo'yicha: {sparkline(hours)} ({sum(hours)} ovoz)")
+    if trend is not None:
+        arrow = "📈" if trend > 0 else "📉" if trend < 0 else "➡️"
+        lines.append(f"Trend (oxirgi 12 soat oldingisiga nisbatan): {arrow} {trend:+.0f}%")
+    return "\n".join(lines)
+
+@callback_router.route("stats_", parse=parse_poll_id)
+async def show_poll_stats(call: CallbackQuery, poll_id: str):
+    poll = polls.get(poll_id)
     
+    if not poll:
+        await call.answer("So'rovnoma topilmadi")
+        return
+    
+    if call.from_user.id not in ADMIN_IDS and call.from_user.id != poll.get('creator'):
+        await call.answer("Bu sizning so'rovnomaningiz emas!", show_alert=True)
+        return
+    
+    if poll['kind'] == "ranked":
+        await get_ranked_ballots(poll_id)
+    text = f"{render_poll_results(poll_id)}\n\n{render_poll_timeline(poll_id)}"
+    # Natijalar izoh chegarasidan oshib ketishi mumkin, shuning uchun rasm alohida yuboriladi
     if poll.get('image'):
         await call.message.answer_photo(
             photo=poll['image'],
-            caption="\n".join(stats_text)
+            caption=shorten_text(poll['title'], CAPTION_LIMIT)
         )
-    else:
-        await call.message.answer("\n".join(stats_text))
+    await call.message.answer(shorten_text(text, TEXT_LIMIT))
+    
+    await call.answer()
+
+# Jonli natijalar: so'rovnoma natijalari xabari (masalan, kanalda) ovozlar kelishi
+# bilan tahrirlanadi, lekin LIVE_RESULTS_INTERVAL soniyada bir martadan ko'p emas
+live_messages: Dict[str, List[Dict]] = {}
+live_update_tasks: Dict[str, asyncio.Task] = {}
+live_last_update: Dict[str, float] = {}
+# Faqat shu xatolarda xabar yo'qolgan deb hisoblanib, ro'yxatdan butunlay olib tashlanadi
+LIVE_MESSAGE_GONE = ("message to edit not found", "chat not found", "MESSAGE_ID_INVALID")
+
+def drop_live_message(poll_id: str, live: Dict, error: Exception):
+    logging.error(f"Jonli natijalar xabari o'chirildi: {error}")
+    live_messages[poll_id].remove(live)
+    storage.remove_live_message(live['chat_id'], live['message_id'])
+
+def schedule_live_update(poll_id: str):
+    if poll_id in live_messages and poll_id not in live_update_tasks:
+        live_update_tasks[poll_id] = spawn(_run_live_update(poll_id))
+
+async def _run_live_update(poll_id: str):
+    try:
+        delay = live_last_update.get(poll_id, 0) + LIVE_RESULTS_INTERVAL - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    finally:
+        live_update_tasks.pop(poll_id, None)
+    live_last_update[poll_id] = time.monotonic()
+    if poll_id not in polls:
+        return
+    results = render_poll_results(poll_id)
+    for live in list(live_messages.get(poll_id, [])):
+        text = shorten_text(results, CAPTION_LIMIT if live['is_caption'] else TEXT_LIMIT)
+        if live.get('last_text') == text:
+            continue
+        try:
+            # Sarlavha va variantlar foydalanuvchi matni - HTML sifatida talqin qilinmaydi
+            if live['is_caption']:
+                await bot.edit_message_caption(
+                    chat_id=live['chat_id'], message_id=live['message_id'], caption=text, parse_mode=None
+                )
+            else:
+                await bot.edit_message_text(
+                    text, chat_id=live['chat_id'], message_id=live['message_id'], parse_mode=None
+                )
+            live['last_text'] = text
+        except TelegramRetryAfter as e:
+            logging.warning(f"Jonli natijalarni yangilash {e.retry_after} soniyaga kechiktirildi")
+            live_last_update[poll_id] = time.monotonic() + e.retry_after
+            schedule_live_update(poll_id)
+            return
+        except TelegramBadRequest as e:
+            if "not modified" in e.message:
+                live['last_text'] = text
+                continue
+            if not any(reason in e.message for reason in LIVE_MESSAGE_GONE):
+                logging.error(f"Jonli natijalarni yangilashda xato: {e}")
+                continue
+            drop_live_message(poll_id, live, e)
+        except TelegramForbiddenError as e:
+            # Bot kanaldan chiqarilgan yoki unda yozish huquqi yo'q - xabar ham yo'qolgan hisoblanadi
+            drop_live_message(poll_id, live, e)
+        except Exception as e:
+            logging.error(f"Jonli natijalarni yangilashda xato: {e}")
+
+@callback_router.route("live_", parse=parse_poll_id)
+async def live_results_prompt(call: CallbackQuery, poll_id: str, state: FSMContext):
+    poll = polls.get(poll_id)
+    
+    if not poll:
+        await call.answer("So'rovnoma topilmadi")
+        return
     
+    if call.from_user.id not in ADMIN_IDS and call.from_user.id != poll.get('creator'):
+        await call.answer("Bu sizning so'rovnomaningiz emas!", show_alert=True)
+        return
+    
+    await call.message.answer(
+        "Jonli natijalar qaysi chatga joylansin? Kanal usernameni kiriting (@ belgisi bilan) "
+        "yoki shu chat uchun 'shu' deb yozing:"
+    )
+    await state.set_state(LiveResultsState.waiting_for_chat)
+    await state.update_data(poll_id=poll_id)
     await call.answer()
 
+@dp.message(LiveResultsState.waiting_for_chat)
+async def post_live_results(message: Message, state: FSMContext):
+    data = await state.get_data()
+    await state.clear()
+    poll_id = data.get('poll_id')
+    if poll_id not in polls:
+        await message.answer("So'rovnoma topilmadi")
+        return
+    
+    target = message.text.strip() if message.text else ""
+    if target.lower() == "shu":
+        chat_id = message.chat.id
+    else:
+        chat_id = target if target.startswith("@") else "@" + target
+    
+    poll = polls[poll_id]
+    text = shorten_text(render_poll_results(poll_id), CAPTION_LIMIT if poll.get('image') else TEXT_LIMIT)
+    try:
+        if poll.get('image'):
+            sent = await bot.send_photo(chat_id, photo=poll['image'], caption=text, parse_mode=None)
+        else:
+            sent = await bot.send_message(chat_id, text, parse_mode=None)
+    except Exception as e:
+        logging.error(f"Jonli natijalarni joylashda xato: {e}")
+        await message.answer("Xabarni joylab bo'lmadi. Bot chatda admin ekanligini tekshiring.")
+        return
+    
+    try:
+        await bot.pin_chat_message(sent.chat.id, sent.message_id, disable_notification=True)
+    except Exception as e:
+        logging.error(f"Jonli natijalar xabarini qadashda xato: {e}")
+    
+    is_caption = bool(poll.get('image'))
+    live_messages.setdefault(poll_id, []).append({
+        'chat_id': sent.chat.id,
+        'message_id': sent.message_id,
+        'is_caption': is_caption,
+        'last_text': text
+    })
+    storage.add_live_message(poll_id, sent.chat.id, sent.message_id, is_caption)
+    await message.answer("Jonli natijalar xabari joylandi.")
+
+# Ovozlarni eksport qilish (CSV/JSONL). Fayl fon oqimida bazadan qismlab o'qilib,
+# SpooledTemporaryFile ga yoziladi (katta fayl avtomatik diskka o'tadi) va qismlab yuboriladi.
+EXPORT_SPOOL_SIZE = 4 * 1024 * 1024
+
+class SpooledInputFile(InputFile):
+    def __init__(self, file, filename: str):
+        super().__init__(filename=filename)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        await asyncio.to_thread(self.file.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(self.file.read, self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def write_poll_export(poll_id: str, options: List[str], kind: str, fmt: str):
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    rows = 0
+    if fmt == "csv":
+        writer = csv.writer(text)
+        writer.writerow(["user_id", "option", "voted_at"])
+    separator = " > " if kind == "ranked" else "; "
+    for user_id, option_index, ballot, voted_at in storage.iter_votes(poll_id):
+        option = separator.join(options[i] for i in (ballot or (option_index,)) if 0 <= i < len(options))
+        timestamp = datetime.fromtimestamp(voted_at).isoformat(timespec="seconds")
+        if fmt == "csv":
+            writer.writerow([user_id, option, timestamp])
+        else:
+            text.write(json.dumps(
+                {"user_id": user_id, "option": option, "voted_at": timestamp}, ensure_ascii=False
+            ) + "\n")
+        rows += 1
+    text.flush()
+    text.detach()
+    return spool, rows
+
+@callback_router.route("export_", parse=split_pair)
+async def export_poll(call: CallbackQuery, payload: Tuple[str, str]):
+    poll_id, fmt = payload
+    poll = polls.get(poll_id)
+    
+    if not poll:
+        await call.answer("So'rovnoma topilmadi")
+        return
+    
+    if call.from_user.id not in ADMIN_IDS and call.from_user.id != poll.get('creator'):
+        await call.answer("Bu sizning so'rovnomaningiz emas!", show_alert=True)
+        return
+    
+    if fmt not in ("csv", "jsonl"):
+        await call.answer("Noma'lum format", show_alert=True)
+        return
+    
+    await call.answer("Eksport tayyorlanmoqda...")
+    # Navbatdagi ovozlar ham faylga tushishi uchun avval bazaga yoziladi
+    await storage.flush()
+    spool, rows = await asyncio.to_thread(write_poll_export, poll_id, list(poll['options']), poll['kind'], fmt)
+    try:
+        await call.message.answer_document(
+            SpooledInputFile(spool, f"poll_{poll_id}.{fmt}"),
+            # Sarlavha foydalanuvchi matni: HTML sifatida talqin qilinmaydi
+            caption=shorten_text(f"{poll['title']}: {rows} ta ovoz", CAPTION_LIMIT),
+            parse_mode=None
+        )
+    except Exception as e:
+        logging.error(f"Eksport faylini yuborishda xato: {e}")
+        await call.message.answer("Eksport faylini yuborib bo'lmadi.")
+    finally:
+        await asyncio.to_thread(spool.close)
+
 # Adminlarni boshqarish
-@dp.callback_query(F.data == "admins")
+@callback_router.route("admins")
 async def manage_admins(call: CallbackQuery, state: FSMContext):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
@@ -415,7 +1954,7 @@ async def manage_admins(call: CallbackQuery, state: FSMContext):
     await call.message.answer("Adminlarni boshqarish:", reply_markup=kb.as_markup())
     await call.answer()
 
-@dp.callback_query(F.data == "add_admin")
+@callback_router.route("add_admin")
 async def add_admin_prompt(call: CallbackQuery, state: FSMContext):
     await call.message.answer("Yangi admin ID sini kiriting:")
     await state.set_state(AdminState.waiting_for_new_admin_id)
@@ -434,7 +1973,7 @@ async def add_admin(message: Message, state: FSMContext):
         await message.answer("Noto'g'ri ID format. Faqat raqam kiriting.")
     await state.clear()
 
-@dp.callback_query(F.data == "remove_admin")
+@callback_router.route("remove_admin")
 async def remove_admin_prompt(call: CallbackQuery, state: FSMContext):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
@@ -464,7 +2003,7 @@ async def remove_admin(message: Message, state: FSMContext):
         await message.answer("Noto'g'ri ID format. Faqat raqam kiriting.")
     await state.clear()
 
-@dp.callback_query(F.data == "list_admins")
+@callback_router.route("list_admins")
 async def list_admins(call: CallbackQuery):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
@@ -479,7 +2018,7 @@ async def list_admins(call: CallbackQuery):
     await call.answer()
 
 # Kanallarni boshqarish
-@dp.callback_query(F.data == "channels")
+@callback_router.route("channels")
 async def manage_channels(call: CallbackQuery, state: FSMContext):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
@@ -494,7 +2033,7 @@ async def manage_channels(call: CallbackQuery, state: FSMContext):
     await call.message.answer("Kanallarni boshqarish:", reply_markup=kb.as_markup())
     await call.answer()
 
-@dp.callback_query(F.data == "add_channel")
+@callback_router.route("add_channel")
 async def add_channel_prompt(call: CallbackQuery, state: FSMContext):
     await call.message.answer("Yangi kanal usernameni kiriting (@ belgisi bilan):")
     await state.set_state(ChannelState.waiting_for_new_channel)
@@ -513,7 +2052,28 @@ async def add_channel(message: Message, state: FSMContext):
         await message.answer("Bu kanal allaqachon ro'yxatda.")
     await state.clear()
 
-@dp.callback_query(F.data == "remove_channel")
+# Kanallar ro'yxati qisqa va kam o'zgaradi, shuning uchun bu yerda sahifa tartib raqami bilan
+class RemoveChannelPage(CallbackData, prefix="rcp"):
+    page: int = 0
+
+def render_remove_channel_markup(page: int) -> InlineKeyboardMarkup:
+    pages = max(1, -(-len(CHANNELS) // MENU_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    start_index = page * MENU_PAGE_SIZE
+    kb = InlineKeyboardBuilder()
+    for channel in CHANNELS[start_index:start_index + MENU_PAGE_SIZE]:
+        kb.row(InlineKeyboardButton(text=channel, callback_data=f"remove_ch_{page}_{channel}"))
+    if pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton(text="⬅️", callback_data=RemoveChannelPage(page=page - 1).pack()))
+        nav.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data=RemoveChannelPage(page=page).pack()))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton(text="➡️", callback_data=RemoveChannelPage(page=page + 1).pack()))
+        kb.row(*nav)
+    return kb.as_markup()
+
+@callback_router.route("remove_channel")
 async def remove_channel_prompt(call: CallbackQuery, state: FSMContext):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
@@ -523,29 +2083,46 @@ async def remove_channel_prompt(call: CallbackQuery, state: FSMContext):
         await call.answer("Kanallar ro'yxati bo'sh", show_alert=True)
         return
     
-    kb = InlineKeyboardBuilder()
-    for channel in CHANNELS:
-        kb.button(text=channel, callback_data=f"remove_ch_{channel}")
-    kb.adjust(1)
+    await call.message.answer("O'chirish uchun kanalni tanlang:", reply_markup=render_remove_channel_markup(0))
+    await call.answer()
+
+@callback_router.route(RemoveChannelPage)
+async def remove_channel_page(call: CallbackQuery, callback_data: RemoveChannelPage):
+    if call.from_user.id not in ADMIN_IDS:
+        await call.answer("Faqat adminlar uchun!", show_alert=True)
+        return
     
-    await call.message.answer("O'chirish uchun kanalni tanlang:", reply_markup=kb.as_markup())
+    try:
+        await call.message.edit_reply_markup(reply_markup=render_remove_channel_markup(callback_data.page))
+    except TelegramBadRequest:
+        pass
     await call.answer()
 
-@dp.callback_query(F.data.startswith("remove_ch_"))
-async def remove_channel(call: CallbackQuery):
+@callback_router.route("remove_ch_")
+async def remove_channel(call: CallbackQuery, rest: str):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
         return
     
-    channel = call.data.split("_", 2)[-1]
-    if channel in CHANNELS:
-        CHANNELS.remove(channel)
-        await call.answer(f"{channel} kanali ro'yxatdan o'chirildi!", show_alert=True)
-        await call.message.delete()
-    else:
+    # Eski xabarlardagi tugmalar: "remove_ch_<kanal>"
+    page, _, channel = rest.partition("_")
+    if not page.isdigit():
+        page, channel = "0", rest
+    if channel not in CHANNELS:
         await call.answer("Bu kanal ro'yxatda mavjud emas!", show_alert=True)
+        return
+    
+    CHANNELS.remove(channel)
+    await call.answer(f"{channel} kanali ro'yxatdan o'chirildi!", show_alert=True)
+    if CHANNELS:
+        try:
+            await call.message.edit_reply_markup(reply_markup=render_remove_channel_markup(int(page)))
+        except TelegramBadRequest:
+            pass
+    else:
+        await call.message.delete()
 
-@dp.callback_query(F.data == "list_channels")
+@callback_router.route("list_channels")
 async def list_channels(call: CallbackQuery):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
@@ -559,15 +2136,280 @@ async def list_channels(call: CallbackQuery):
     await call.message.answer(f"Obuna bo'lish kerak bo'lgan kanallar:\n{channels_list}")
     await call.answer()
 
+# Xabarnoma tarqatish sozlamalari
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "20"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+BROADCAST_STATE_FILE = os.getenv("BROADCAST_STATE_FILE", "broadcast_state.json")
+# "So'nggi faol foydalanuvchilar" segmenti necha kunni qamraydi
+AUDIENCE_RECENT_DAYS = int(os.getenv("AUDIENCE_RECENT_DAYS", "30"))
+
+# Fon vazifalari (garbage collector yo'q qilmasligi uchun)
+background_tasks: Set[asyncio.Task] = set()
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Global token chelak: sekundiga `rate` tadan ko'p so'rov yubormaydi
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+broadcast_bucket = TokenBucket(BROADCAST_RATE)
+
+# Tarqatish holati; kursor - undan oldingi barcha foydalanuvchilar qayta ishlangan indeks
+class Broadcast:
+    def __init__(self, state: Dict):
+        self.state = state
+        self.recipients: List[int] = state['recipients']
+        self.next_index = state['cursor']
+        self.in_flight: Set[int] = set()
+        # Holat faylini yozish va o'chirish bitta qulf ostida: tugagan xabarnomaning
+        # kechikkan yozuvi o'chirilgan faylni qayta tiklab qo'ymasligi uchun
+        self.state_lock = threading.Lock()
+        self.finished = False
+        state.setdefault('inactive', 0)
+
+    @classmethod
+    def create(cls, from_chat_id: int, message_id: int, status: Message, recipients: List[int]) -> "Broadcast":
+        return cls({
+            'from_chat_id': from_chat_id,
+            'message_id': message_id,
+            'admin_chat_id': status.chat.id,
+            'status_message_id': status.message_id,
+            'recipients': recipients,
+            'cursor': 0,
+            'success': 0,
+            'failed': 0,
+            'inactive': 0,
+        })
+
+    @property
+    def cursor(self) -> int:
+        return min(self.in_flight) if self.in_flight else self.next_index
+
+    def _write_state(self, state: Dict):
+        # Qabul qiluvchilar ro'yxati katta bo'lishi mumkin - JSON ham shu oqimda tayyorlanadi
+        data = json.dumps(state)
+        with self.state_lock:
+            if self.finished:
+                return
+            tmp_path = BROADCAST_STATE_FILE + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, BROADCAST_STATE_FILE)
+
+    def _clear_state(self):
+        with self.state_lock:
+            self.finished = True
+            if os.path.exists(BROADCAST_STATE_FILE):
+                os.remove(BROADCAST_STATE_FILE)
+
+    async def save(self):
+        self.state['cursor'] = self.cursor
+        # Sanoqlar event loop'da o'zgarib turadi, oqimga ularning nusxasi beriladi
+        await asyncio.to_thread(self._write_state, dict(self.state))
+
+    async def _send(self, user_id: int) -> bool:
+        while True:
+            await broadcast_bucket.acquire()
+            try:
+                await broadcast_bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=self.state['from_chat_id'],
+                    message_id=self.state['message_id']
+                )
+                return True
+            except TelegramRetryAfter as e:
+                logging.warning(f"Telegram cheklovi: {e.retry_after} soniya kutilmoqda")
+                broadcast_bucket.pause(e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Botni bloklagan yoki o'chirilgan akkauntlar keyingi xabarnomalarda o'tkazib yuboriladi
+                if isinstance(e, TelegramForbiddenError) or "chat not found" in e.message.lower():
+                    mark_user_inactive(user_id)
+                    self.state['inactive'] += 1
+                else:
+                    logging.error(f"Xabarnomani {user_id} ga yuborishda xato: {e}")
+                return False
+            except Exception as e:
+                logging.error(f"Xabarnomani {user_id} ga yuborishda xato: {e}")
+                return False
+
+    async def _worker(self):
+        while self.next_index < len(self.recipients):
+            index = self.next_index
+            self.next_index += 1
+            self.in_flight.add(index)
+            try:
+                if await self._send(self.recipients[index]):
+                    self.state['success'] += 1
+                else:
+                    self.state['failed'] += 1
+            finally:
+                self.in_flight.discard(index)
+
+    def progress_text(self) -> str:
+        return (
+            f"Xabarnoma yuborilmoqda: {self.cursor}/{len(self.recipients)}\n"
+            f"Muvaffaqiyatli: {self.state['success']}\n"
+            f"Muvaffaqiyatsiz: {self.state['failed']}\n"
+            f"Botni bloklaganlar: {self.state['inactive']}"
+        )
+
+    async def _update_status(self, text: str):
+        try:
+            await bot.edit_message_text(
+                text,
+                chat_id=self.state['admin_chat_id'],
+                message_id=self.state['status_message_id']
+            )
+        except TelegramBadRequest:
+            pass
+        except Exception as e:
+            logging.error(f"Xabarnoma holatini yangilashda xato: {e}")
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+            await self.save()
+            await self._update_status(self.progress_text())
+
+    async def run(self):
+        reporter = asyncio.create_task(self._report_progress())
+        try:
+            workers = [asyncio.create_task(self._worker()) for _ in range(max(1, BROADCAST_WORKERS))]
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            try:
+                await reporter
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(self._clear_state)
+        await self._update_status(
+            f"Xabarnoma yuborildi!\n"
+            f"Muvaffaqiyatli: {self.state['success']}\n"
+            f"Muvaffaqiyatsiz: {self.state['failed']}\n"
+            f"Botni bloklaganlar: {self.state['inactive']}"
+        )
+
+current_broadcast: Optional[Broadcast] = None
+
+async def _run_broadcast(broadcast: Broadcast):
+    global current_broadcast
+    try:
+        await broadcast.save()
+        await broadcast.run()
+    except Exception as e:
+        logging.error(f"Xabarnoma tarqatishda xato: {e}")
+    finally:
+        current_broadcast = None
+
+def start_broadcast(broadcast: Broadcast):
+    global current_broadcast
+    current_broadcast = broadcast
+    spawn(_run_broadcast(broadcast))
+
+# Qayta ishga tushganda tugallanmagan tarqatishni davom ettirish
+def resume_broadcast():
+    if not os.path.exists(BROADCAST_STATE_FILE):
+        return
+    try:
+        with open(BROADCAST_STATE_FILE, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Xabarnoma holatini o'qishda xato: {e}")
+        return
+    logging.info(f"Xabarnoma {state['cursor']}/{len(state['recipients'])} dan davom ettirilmoqda")
+    start_broadcast(Broadcast(state))
+
+# Xabarnoma auditoriyasi: segment ro'yxati o'z indeksidan olinadi
+AUDIENCE_LABELS = {
+    "all": "Barcha foydalanuvchilar",
+    "recent": f"So'nggi {AUDIENCE_RECENT_DAYS} kunda faol",
+    "subscribed": "Kanallarga obuna bo'lganlar",
+}
+
+def audience_label(audience: str) -> str:
+    if audience.startswith("poll_"):
+        poll = polls.get(audience[5:])
+        return f"\"{poll['title']}\" so'rovnomasida ovoz berganlar" if poll else "So'rovnoma topilmadi"
+    return AUDIENCE_LABELS.get(audience, AUDIENCE_LABELS["all"])
+
+async def resolve_audience(audience: str) -> List[int]:
+    if audience == "recent":
+        prune_activity_days(int(time.time() // 86400))
+        candidates = set()
+        for day_users in activity_days.values():
+            candidates.update(day_users)
+    elif audience == "subscribed":
+        candidates = subscribed_users
+    elif audience.startswith("poll_"):
+        poll_id = audience[5:]
+        candidates = await get_voters(poll_id) if poll_id in polls else ()
+    else:
+        candidates = users
+    return [user_id for user_id in candidates if user_id not in inactive_users]
+
 # Xabarnoma yuborish
-@dp.callback_query(F.data == "announcement")
+@callback_router.route("announcement")
 async def start_announcement(call: CallbackQuery, state: FSMContext):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
         return
     
+    kb = InlineKeyboardBuilder()
+    for audience, label in AUDIENCE_LABELS.items():
+        kb.button(text=label, callback_data=f"audience_{audience}")
+    kb.adjust(1)
+    await call.message.answer(
+        "Xabarnoma kimlarga yuborilsin?\n"
+        "So'rovnomada ovoz berganlarga yuborish uchun so'rovnoma sozlamalaridan foydalaning.",
+        reply_markup=kb.as_markup()
+    )
+    await call.answer()
+
+@callback_router.route("audience_")
+async def choose_audience(call: CallbackQuery, audience: str, state: FSMContext):
+    if call.from_user.id not in ADMIN_IDS:
+        await call.answer("Faqat adminlar uchun!", show_alert=True)
+        return
+    
+    if audience.startswith("poll_") and audience[5:] not in polls:
+        await call.answer("So'rovnoma topilmadi")
+        return
+    
+    await state.update_data(audience=audience, send_at=None)
     await call.message.answer(
+        f"Auditoriya: {audience_label(audience)}\n"
         "Xabarnoma yuborish uchun xabarni yuboring (matn, rasm, video, etc.):\n"
+        "Keyinroq yuborish uchun avval /at 2026-01-20 09:00 buyrug'ini yuboring.\n"
         "Bekor qilish uchun /cancel buyrug'ini yuboring."
     )
     await state.set_state(AnnouncementState.waiting_for_announcement)
@@ -578,72 +2420,203 @@ async def cancel_announcement(message: Message, state: FSMContext):
     await state.clear()
     await message.answer("Xabarnoma bekor qilindi.")
 
-@dp.message(AnnouncementState.waiting_for_announcement)
-async def send_announcement(message: Message, state: FSMContext):
-    total_users = len(users)
-    if total_users == 0:
-        await message.answer("Hozircha obunachilar mavjud emas.")
-        await state.clear()
+@dp.message(AnnouncementState.waiting_for_announcement, F.text.startswith("/at"))
+async def set_announcement_time(message: Message, state: FSMContext):
+    try:
+        send_at = parse_schedule_time(message.text[len("/at"):])
+    except ValueError:
+        send_at = None
+    if send_at is None or send_at <= time.time():
+        await message.answer("Kelajakdagi vaqtni kiriting, masalan: /at 2026-01-20 09:00")
         return
     
-    success = 0
-    failed = 0
-    
-    await message.answer(f"Xabarnoma {total_users} ta foydalanuvchiga yuborilmoqda...")
-    
-    for user_id in users:
-        try:
-            await message.send_copy(user_id)
-            success += 1
-        except Exception as e:
-            logging.error(f"Xabarnomani {user_id} ga yuborishda xato: {e}")
-            failed += 1
-        await asyncio.sleep(0.1)
-    
+    await state.update_data(send_at=send_at)
     await message.answer(
-        f"Xabarnoma yuborildi!\n"
-        f"Muvaffaqiyatli: {success}\n"
-        f"Muvaffaqiyatsiz: {failed}"
+        f"Xabarnoma {format_schedule_time(send_at)} da yuboriladi. Endi xabarni yuboring."
+    )
+
+# Auditoriyani hisoblab tarqatishni boshlaydi; boshqa tarqatish ketayotgan bo'lsa False
+async def launch_broadcast(from_chat_id: int, message_id: int, admin_chat_id: int, audience: str) -> bool:
+    if current_broadcast is not None:
+        return False
+    recipients = await resolve_audience(audience)
+    if current_broadcast is not None:
+        return False
+    if not recipients:
+        await bot.send_message(admin_chat_id, "Bu auditoriyada hozircha foydalanuvchilar mavjud emas.")
+        return True
+    
+    status = await bot.send_message(
+        admin_chat_id,
+        f"Xabarnoma {len(recipients)} ta foydalanuvchiga yuborilmoqda ({audience_label(audience)})..."
     )
+    start_broadcast(Broadcast.create(from_chat_id, message_id, status, recipients))
+    return True
+
+# Vaqti kelgan xabarnoma boshqasi tugaguncha bir daqiqadan keyin qayta uriniladi
+async def run_scheduled_broadcast(key: str, payload: Dict):
+    if not await launch_broadcast(payload['from_chat_id'], payload['message_id'],
+                                  payload['admin_chat_id'], payload['audience']):
+        scheduler.add(key, time.time() + 60, payload)
+
+scheduler.register("broadcast", run_scheduled_broadcast)
+
+@dp.message(AnnouncementState.waiting_for_announcement)
+async def send_announcement(message: Message, state: FSMContext):
+    data = await state.get_data()
+    audience = data.get("audience", "all")
+    send_at = data.get("send_at")
     await state.clear()
+    
+    if send_at is not None:
+        key = f"broadcast:{message.chat.id}:{message.message_id}"
+        scheduler.add(key, send_at, {
+            'from_chat_id': message.chat.id,
+            'message_id': message.message_id,
+            'admin_chat_id': message.chat.id,
+            'audience': audience,
+        })
+        kb = InlineKeyboardBuilder()
+        kb.button(text="❌ Bekor qilish", callback_data=f"unschedule_{key}")
+        await message.answer(
+            f"Xabarnoma {format_schedule_time(send_at)} da yuboriladi ({audience_label(audience)}).",
+            reply_markup=kb.as_markup()
+        )
+        return
+    
+    if not await launch_broadcast(message.chat.id, message.message_id, message.chat.id, audience):
+        await message.answer("Boshqa xabarnoma hali yuborilmoqda. Iltimos, keyinroq urinib ko'ring.")
 
-# Bot statistikasi
-@dp.callback_query(F.data == "stats")
-async def show_bot_stats(call: CallbackQuery):
+@callback_router.route("unschedule_broadcast:")
+async def cancel_scheduled_broadcast(call: CallbackQuery, broadcast_id: str):
     if call.from_user.id not in ADMIN_IDS:
         await call.answer("Faqat adminlar uchun!", show_alert=True)
         return
     
-    active_polls = sum(1 for p in polls.values() if p.get('is_active', True))
-    inactive_polls = len(polls) - active_polls
-    total_votes = sum(len(v) for v in votes.values())
+    if scheduler.cancel(f"broadcast:{broadcast_id}"):
+        await call.message.edit_text("Rejalashtirilgan xabarnoma bekor qilindi.")
+        await call.answer()
+    else:
+        await call.answer("Xabarnoma allaqachon yuborilgan yoki bekor qilingan", show_alert=True)
+
+# Bot statistikasi
+def render_bot_stats(page: int) -> Tuple[str, InlineKeyboardMarkup]:
+    order = get_poll_order()
+    pages = max(1, -(-len(order) // STATS_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    active_polls = len(active_poll_ids)
     
     stats_text = [
         "📊 Bot statistikasi:",
         f"Jami foydalanuvchilar: {len(users)}",
         f"Jami so'rovnomalar: {len(polls)}",
         f"Faol so'rovnomalar: {active_polls}",
-        f"Yakunlangan so'rovnomalar: {inactive_polls}",
-        f"Jami ovozlar: {total_votes}",
-        "So'rovnomalar ro'yxati:"
+        f"Yakunlangan so'rovnomalar: {len(polls) - active_polls}",
+        f"Jami ovozlar: {bot_counters['total_votes']}",
+        f"So'rovnomalar ro'yxati ({page + 1}/{pages}):"
     ]
     
-    for poll_id, poll in polls.items():
+    start_index = page * STATS_PAGE_SIZE
+    for poll_id in order[start_index:start_index + STATS_PAGE_SIZE]:
+        poll = polls[poll_id]
         status = "✅ Faol" if poll.get('is_active', True) else "❌ Yakunlangan"
         stats_text.append(
-            f"- {poll['title']} ({status}): {len(votes.get(poll_id, set()))} ovoz"
+            f"- {poll['title']} ({status}): {poll_vote_count(poll)} ovoz"
         )
     
-    await call.message.answer("\n".join(stats_text))
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"botstats_{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"botstats_{page + 1}"))
+    return "\n".join(stats_text), InlineKeyboardMarkup(inline_keyboard=[nav] if nav else [])
+
+@callback_router.route("stats")
+async def show_bot_stats(call: CallbackQuery):
+    if call.from_user.id not in ADMIN_IDS:
+        await call.answer("Faqat adminlar uchun!", show_alert=True)
+        return
+    
+    text, markup = render_bot_stats(0)
+    await call.message.answer(text, reply_markup=markup)
+    await call.answer()
+
+@callback_router.route("botstats_", parse=int)
+async def show_bot_stats_page(call: CallbackQuery, page: int):
+    if call.from_user.id not in ADMIN_IDS:
+        await call.answer("Faqat adminlar uchun!", show_alert=True)
+        return
+    
+    text, markup = render_bot_stats(page)
+    try:
+        await call.message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest:
+        pass
     await call.answer()
 
 # Botni ishga tushirish
+async def on_startup():
+    await load_storage()
+    await start_metrics_server()
+    resume_broadcast()
+    scheduler.start()
+    spawn(checkpoint_vote_journal())
+    spawn(flush_vote_digests())
+    spawn(monitor_loop_lag())
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({
+        "status": "ok",
+        "mode": BOT_MODE,
+        "polls": len(polls),
+        "users": len(users)
+    })
+
+def create_webhook_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/health", health)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=WEBHOOK_HANDLE_IN_BACKGROUND,
+        secret_token=WEBHOOK_SECRET
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook():
+    runner = web.AppRunner(create_webhook_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+    logging.info(f"Webhook server {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} da ishga tushdi")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
+
 async def main():
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
-    await dp.start_polling(bot)
+    await on_startup()
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        await close_storage()
+        await broadcast_bot.session.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+import re
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, Union
+
+from aiogram import BaseMiddleware
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+SEPARATOR = re.compile(r"[_:]")
+
+def poll_id(value: str) -> str:
+    if not value.isdigit():
+        raise ValueError(value)
+    return value
+
+class Route:
+    __slots__ = ("name", "handler", "parse", "state", "wants_state", "has_payload")
+
+    def __init__(self, handler: Callable[..., Awaitable[Any]], parse: Optional[Callable[[str], Any]],
+                 state: Optional[State], has_payload: bool):
+        self.name = handler.__name__
+        self.handler = handler
+        self.parse = parse
+        self.state = state
+        self.wants_state = "state" in inspect.signature(handler).parameters
+        self.has_payload = has_payload
+
+# callback_data bo'yicha jadvalli marshrutlash. To'liq qiymatlar ("stats", "new_poll") va
+# prefikslar ("stats_", "s:") alohida lug'atlarda; prefiks "_" yoki ":" bilan tugaydi.
+# Avval to'liq moslik, keyin eng uzun prefiks tekshiriladi - bir nechta lug'at murojaati,
+# handlerlar soniga bog'liq emas. Qolgan qism (payload) bir marta parse qilinib handlerga beriladi.
+#
+# Outer middleware sifatida marshrutni topib data["callback_route"] ga yozadi (metrikalar
+# handler nomini shu yerdan oladi), handle esa yagona callback_query handleri.
+class CallbackRouter(BaseMiddleware):
+    def __init__(self):
+        self.exact: Dict[str, Route] = {}
+        self.prefixes: Dict[str, Route] = {}
+        self.depth = 0
+
+    def route(self, key: Union[str, Type[CallbackData]], parse: Optional[Callable[[str], Any]] = None,
+              state: Optional[State] = None):
+        if isinstance(key, type) and issubclass(key, CallbackData):
+            factory = key
+            key = f"{factory.__prefix__}{factory.__separator__}"
+            parse = lambda value: factory.unpack(key + value)
+
+        def decorator(handler: Callable[..., Awaitable[Any]]):
+            is_prefix = key[-1] in "_:"
+            table = self.prefixes if is_prefix else self.exact
+            if key in table:
+                raise ValueError(f"Marshrut allaqachon mavjud: {key}")
+            table[key] = Route(handler, parse, state, is_prefix)
+            if is_prefix:
+                self.depth = max(self.depth, len(SEPARATOR.findall(key)))
+            return handler
+        return decorator
+
+    def resolve(self, data: str) -> Optional[Tuple[Route, Any]]:
+        route = self.exact.get(data)
+        if route is not None:
+            return route, None
+        ends = []
+        for match in SEPARATOR.finditer(data):
+            ends.append(match.end())
+            if len(ends) == self.depth:
+                break
+        for end in reversed(ends):
+            route = self.prefixes.get(data[:end])
+            if route is None:
+                continue
+            value = data[end:]
+            try:
+                return route, route.parse(value) if route.parse is not None else value
+            except (TypeError, ValueError):
+                return None
+        return None
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, CallbackQuery) and event.data:
+            data["callback_route"] = self.resolve(event.data)
+        return await handler(event, data)
+
+    async def handle(self, call: CallbackQuery, state: FSMContext,
+                     callback_route: Optional[Tuple[Route, Any]] = None) -> Any:
+        if callback_route is None:
+            await call.answer()
+            return None
+        route, payload = callback_route
+        if route.state is not None and await state.get_state() != route.state.state:
+            await call.answer()
+            return None
+        args = (call, payload) if route.has_payload else (call,)
+        if route.wants_state:
+            return await route.handler(*args, state=state)
+        return await route.handler(*args)
@@ -0,0 +1,115 @@
+import json
+import asyncio
+import sqlite3
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+"""
+
+# Bir nechta bot jarayoni bitta SQLite faylidagi FSM holatidan foydalanadi.
+# Har bir jarayon holatlarni o'z keshida saqlaydi; boshqa jarayon bazaga yozsa
+# (PRAGMA data_version o'zgaradi) kesh butunlay tozalanadi.
+# Faqat FSM holati umumiy; so'rovnomalar va ovozlar har bir jarayonning o'z xotirasida.
+class SqliteStorage(BaseStorage):
+    def __init__(self, path: str):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = asyncio.Lock()
+        self.cache: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        self.data_version: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or 0}:{key.destiny}"
+
+    def _validate_cache(self):
+        # data_version faqat boshqa ulanishlar yozganda o'zgaradi; so'rov xotiradan o'qiladi
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.cache.clear()
+            self.data_version = version
+
+    def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        row = self.conn.execute("SELECT state, data FROM fsm WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1])
+
+    def _save(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        if state is None and not data:
+            self.conn.execute("DELETE FROM fsm WHERE key = ?", (key,))
+        else:
+            self.conn.execute(
+                "INSERT INTO fsm (key, state, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data",
+                (key, state, json.dumps(data))
+            )
+
+    async def _get(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        if self.conn is None:
+            self.conn = await asyncio.to_thread(self._connect)
+        self._validate_cache()
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self.cache[key] = await asyncio.to_thread(self._load, key)
+        return entry
+
+    async def _set(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        await asyncio.to_thread(self._save, key, state, data)
+        self.cache[key] = (state, data)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name = self._key(key)
+        async with self.lock:
+            _, data = await self._get(name)
+            value = state.state if isinstance(state, State) else state
+            await self._set(name, value, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with self.lock:
+            state, _ = await self._get(self._key(key))
+            return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        name = self._key(key)
+        async with self.lock:
+            state, _ = await self._get(name)
+            await self._set(name, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with self.lock:
+            _, data = await self._get(self._key(key))
+            return dict(data)
+
+    async def close(self) -> None:
+        async with self.lock:
+            if self.conn is not None:
+                await asyncio.to_thread(self.conn.close)
+                self.conn = None
+            self.cache.clear()
+
+
+def create_fsm_storage(kind: str, path: str, redis_url: Optional[str] = None) -> BaseStorage:
+    if kind == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    if kind == "redis":
+        # redis paketi faqat shu rejimda kerak
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(redis_url or "redis://localhost:6379/0")
+    return SqliteStorage(path)
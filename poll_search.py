@@ -0,0 +1,96 @@
+import re
+import heapq
+import bisect
+from typing import Dict, List, Optional, Set, Tuple
+
+# O'zbek lotin yozuvidagi tutuq belgisi turli ko'rinishlarda kiritiladi: o'/oʻ/o‘/o`
+APOSTROPHES = re.compile(r"[ʻʼ‘’`]")
+WORD = re.compile(r"\w+(?:'\w+)*")
+
+def tokenize(text: str) -> List[str]:
+    words = WORD.findall(APOSTROPHES.sub("'", text.lower()))
+    # "so'rovnoma" ham "so'r", ham "sor" bilan topilishi uchun tutuqsiz shakl ham qo'shiladi
+    return words + [word.replace("'", "") for word in words if "'" in word]
+
+# Sarlavhalar bo'yicha prefiks qidiruv indeksi: so'z -> so'rovnoma ID lari va so'zlarning
+# tartiblangan ro'yxati. So'rovdagi har bir so'z shu ro'yxatdan bisect orqali prefiks
+# oralig'i sifatida topiladi, so'zlar natijalari kesishtiriladi. Natija - eng yangisi birinchi.
+#
+# Har bir prefiks uchun to'plam va kamayish tartibidagi ro'yxat LRU keshda saqlanadi:
+# foydalanuvchilar bir xil harflardan yozishni boshlaydi, bitta so'zli so'rov sahifasi esa
+# tayyor ro'yxatning kesmasi. Indeks faqat so'rovnoma qo'shilganda yoki olib tashlanganda
+# o'zgaradi va kesh shunda tozalanadi.
+class PollSearchIndex:
+    CACHE_SIZE = 256
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.words: List[str] = []
+        self.poll_words: Dict[int, Tuple[str, ...]] = {}
+        self.ids: List[int] = []
+        self.prefix_cache: Dict[str, Tuple[Set[int], List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, poll_id: int, title: str):
+        if poll_id in self.poll_words:
+            self.remove(poll_id)
+        words = tuple(set(tokenize(title)))
+        self.poll_words[poll_id] = words
+        bisect.insort(self.ids, poll_id)
+        for word in words:
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                bisect.insort(self.words, word)
+            ids.add(poll_id)
+        self.prefix_cache.clear()
+
+    def remove(self, poll_id: int):
+        words = self.poll_words.pop(poll_id, None)
+        if words is None:
+            return
+        del self.ids[bisect.bisect_left(self.ids, poll_id)]
+        for word in words:
+            ids = self.postings[word]
+            ids.discard(poll_id)
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+        self.prefix_cache.clear()
+
+    def _prefix_ids(self, prefix: str) -> Tuple[Set[int], List[int]]:
+        entry = self.prefix_cache.pop(prefix, None)
+        if entry is not None:
+            # Oxiriga qayta qo'yiladi: eng uzoq ishlatilmagan yozuv birinchi chiqariladi
+            self.prefix_cache[prefix] = entry
+            return entry
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + "\U0010ffff", start)
+        if end - start == 1:
+            found = self.postings[self.words[start]]
+        else:
+            found = set()
+            for word in self.words[start:end]:
+                found |= self.postings[word]
+        if len(self.prefix_cache) >= self.CACHE_SIZE:
+            del self.prefix_cache[next(iter(self.prefix_cache))]
+        entry = self.prefix_cache[prefix] = (found, sorted(found, reverse=True))
+        return entry
+
+    # offset - oldingi sahifalarda qaytarilgan natijalar soni; ikkinchi qiymat keyingi sahifa
+    # offseti yoki natijalar tugagan bo'lsa None
+    def search(self, query: str, offset: int = 0, limit: int = 50) -> Tuple[List[int], Optional[int]]:
+        words = set(WORD.findall(APOSTROPHES.sub("'", query.lower())))
+        if not words:
+            end = max(len(self.ids) - offset, 0)
+            return self.ids[max(end - limit, 0):end][::-1], offset + limit if end > limit else None
+        wanted = offset + limit + 1
+        if len(words) == 1:
+            page = self._prefix_ids(words.pop())[1][:wanted]
+        else:
+            # Kesishma eng kichik to'plamdan boshlab; natija odatda kichik, uni tartiblash arzon
+            sets = sorted((self._prefix_ids(word)[0] for word in words), key=len)
+            page = heapq.nlargest(wanted, sets[0].intersection(*sets[1:]))
+        return page[offset:offset + limit], offset + limit if len(page) > offset + limit else None
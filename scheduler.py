@@ -0,0 +1,119 @@
+import time
+import heapq
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Vaqt soati o'zgarsa ham taymer uzoq uxlab qolmasligi uchun eng uzun kutish
+MAX_SLEEP = 30.0
+
+# Barcha rejalashtirilgan ishlar uchun bitta taymer: (vaqt, kalit) min-heap va bitta fon vazifasi.
+# Ish bekor qilinsa yoki vaqti o'zgarsa, heap'dagi eski yozuv o'chirilmaydi - navbati
+# kelganda jobs bilan solishtirilib tashlab yuboriladi. Kalit "tur:identifikator" ko'rinishida,
+# bir xil kalit bilan qayta qo'shilgan ish oldingisini almashtiradi.
+class Scheduler:
+    def __init__(self, repository):
+        self.repository = repository
+        self.jobs: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.heap: List[Tuple[float, str]] = []
+        self.handlers: Dict[str, Callable[[str, Dict[str, Any]], Any]] = {}
+        self.running: Set[asyncio.Task] = set()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def kind(key: str) -> str:
+        return key.split(":", 1)[0]
+
+    # Sinxron handler taymer ichida to'xtovsiz bajariladi (masalan, so'rovnomani yopish);
+    # asinxron handler alohida vazifa sifatida ishga tushadi va taymerni kutdirmaydi
+    def register(self, kind: str, handler: Callable[[str, Dict[str, Any]], Any]):
+        self.handlers[kind] = handler
+
+    async def load(self):
+        for key, run_at, payload in await self.repository.load_schedule():
+            self.jobs[key] = (run_at, payload)
+        self._rebuild()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def run_at(self, key: str) -> Optional[float]:
+        job = self.jobs.get(key)
+        return job[0] if job is not None else None
+
+    def add(self, key: str, run_at: float, payload: Optional[Dict[str, Any]] = None):
+        payload = payload or {}
+        self.jobs[key] = (run_at, payload)
+        heapq.heappush(self.heap, (run_at, key))
+        self.repository.save_scheduled(key, run_at, payload)
+        self._compact()
+        if self.heap[0] == (run_at, key):
+            self.wakeup.set()
+
+    def cancel(self, key: str) -> bool:
+        if self.jobs.pop(key, None) is None:
+            return False
+        self.repository.remove_scheduled(key)
+        self._compact()
+        return True
+
+    def _rebuild(self):
+        self.heap = [(run_at, key) for key, (run_at, _) in self.jobs.items()]
+        heapq.heapify(self.heap)
+
+    def _compact(self):
+        # Bekor qilingan yozuvlar heap'ni cheksiz kattalashtirmasligi uchun
+        if len(self.heap) > 2 * len(self.jobs) + 64:
+            self._rebuild()
+
+    def _fire(self, key: str, payload: Dict[str, Any]):
+        handler = self.handlers.get(self.kind(key))
+        if handler is None:
+            logging.error(f"Rejalashtirilgan ish uchun handler topilmadi: {key}")
+            return
+        try:
+            result = handler(key, payload)
+        except Exception as e:
+            logging.error(f"Rejalashtirilgan ishni bajarishda xato ({key}): {e}")
+            return
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(self._await(key, result))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    @staticmethod
+    async def _await(key: str, result):
+        try:
+            await result
+        except Exception as e:
+            logging.error(f"Rejalashtirilgan ishni bajarishda xato ({key}): {e}")
+
+    async def _run(self):
+        while True:
+            self.wakeup.clear()
+            now = time.time()
+            while self.heap and self.heap[0][0] <= now:
+                run_at, key = heapq.heappop(self.heap)
+                job = self.jobs.get(key)
+                if job is None or job[0] != run_at:
+                    continue
+                del self.jobs[key]
+                self.repository.remove_scheduled(key)
+                self._fire(key, job[1])
+            timeout = min(MAX_SLEEP, self.heap[0][0] - time.time()) if self.heap else MAX_SLEEP
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
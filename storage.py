@@ -0,0 +1,658 @@
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from voterset import IdSet
+from ballots import new_tally
+
+# Ombor interfeysi: bot faqat shu metodlar orqali ma'lumot saqlaydi
+class PollRepository(ABC):
+    @abstractmethod
+    async def open(self):
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+    @abstractmethod
+    async def load_polls(self) -> Dict[str, Dict]:
+        ...
+
+    @abstractmethod
+    async def load_voters(self, poll_id: str) -> IdSet:
+        ...
+
+    @abstractmethod
+    async def load_users(self) -> IdSet:
+        ...
+
+    @abstractmethod
+    async def load_ballots(self, poll_id: str) -> Dict[bytes, int]:
+        ...
+
+    @abstractmethod
+    def iter_votes(self, poll_id: str) -> Iterator[Tuple[int, int, Optional[bytes], float]]:
+        ...
+
+    @abstractmethod
+    def iter_votes_since(self, since: float) -> Iterator[Tuple[str, int, Optional[bytes], float]]:
+        ...
+
+    @abstractmethod
+    async def allocate_poll_id(self) -> str:
+        ...
+
+    @abstractmethod
+    def save_poll(self, poll_id: str, poll: Dict):
+        ...
+
+    @abstractmethod
+    def set_poll_active(self, poll_id: str, is_active: bool):
+        ...
+
+    @abstractmethod
+    def delete_poll(self, poll_id: str):
+        ...
+
+    @abstractmethod
+    def add_vote(self, poll_id: str, user_id: int, option_index: int, voted_at: float,
+                 ballot: Optional[bytes] = None):
+        ...
+
+    @abstractmethod
+    def add_user(self, user_id: int):
+        ...
+
+    @abstractmethod
+    async def load_inactive_users(self) -> Set[int]:
+        ...
+
+    @abstractmethod
+    async def load_recent_users(self, since: float) -> List[Tuple[int, float]]:
+        ...
+
+    @abstractmethod
+    async def load_subscribed_users(self) -> Set[int]:
+        ...
+
+    @abstractmethod
+    def set_user_active(self, user_id: int, is_active: bool):
+        ...
+
+    @abstractmethod
+    def touch_user(self, user_id: int, seen_at: float):
+        ...
+
+    @abstractmethod
+    def set_user_subscribed(self, user_id: int, is_subscribed: bool):
+        ...
+
+    @abstractmethod
+    async def load_admin_notify_modes(self) -> Dict[int, str]:
+        ...
+
+    @abstractmethod
+    def set_admin_notify_mode(self, admin_id: int, mode: str):
+        ...
+
+    @abstractmethod
+    async def load_live_messages(self) -> Dict[str, List[Dict]]:
+        ...
+
+    @abstractmethod
+    def add_live_message(self, poll_id: str, chat_id: int, message_id: int, is_caption: bool):
+        ...
+
+    @abstractmethod
+    def remove_live_message(self, chat_id: int, message_id: int):
+        ...
+
+    @abstractmethod
+    async def load_schedule(self) -> List[Tuple[str, float, Dict]]:
+        ...
+
+    @abstractmethod
+    def save_scheduled(self, key: str, run_at: float, payload: Dict):
+        ...
+
+    @abstractmethod
+    def remove_scheduled(self, key: str):
+        ...
+
+    @abstractmethod
+    async def flush(self):
+        ...
+
+    @abstractmethod
+    async def checkpoint(self):
+        ...
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS polls (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    image TEXT,
+    options TEXT NOT NULL,
+    creator INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    kind TEXT NOT NULL DEFAULT 'single'
+);
+-- option_index - birinchi tanlov; bir nechta variantli va afzallik bo'yicha
+-- so'rovnomalarda ballot ustunida barcha tanlovlar indekslari (har biri bitta bayt)
+CREATE TABLE IF NOT EXISTS votes (
+    poll_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    option_index INTEGER NOT NULL,
+    voted_at REAL NOT NULL,
+    ballot BLOB,
+    PRIMARY KEY (poll_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    is_subscribed INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL
+);
+CREATE TABLE IF NOT EXISTS admin_settings (
+    admin_id INTEGER PRIMARY KEY,
+    notify_mode TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS live_messages (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    poll_id INTEGER NOT NULL,
+    is_caption INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE TABLE IF NOT EXISTS schedule (
+    key TEXT PRIMARY KEY,
+    run_at REAL NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Ovozlar hisobi: ishga tushishda butun votes jadvalini guruhlamaslik uchun har bir
+# (so'rovnoma, variant, ballot) bo'yicha ovozlar soni trigger orqali yuritiladi.
+# ballot faqat bir nechta variantli so'rovnomalarda saqlanadi (har bir tanlov hisoblanadi),
+# qolganlarida bo'sh - hisobga faqat birinchi tanlov kiradi. Trigger faqat haqiqatan qo'shilgan
+# ovozda ishlaydi, shuning uchun jurnaldan qayta yozilgan ovozlar ikki marta sanalmaydi.
+# Bu qism migratsiyalardan keyin bajariladi (votes.ballot va polls.kind ustunlari kerak).
+COUNTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vote_counts (
+    poll_id INTEGER NOT NULL,
+    option_index INTEGER NOT NULL,
+    ballot BLOB NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (poll_id, option_index, ballot)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS votes_count AFTER INSERT ON votes
+BEGIN
+    INSERT OR IGNORE INTO vote_counts (poll_id, option_index, ballot, count) VALUES (
+        NEW.poll_id, NEW.option_index,
+        CASE WHEN (SELECT kind FROM polls WHERE id = NEW.poll_id) = 'multi' THEN COALESCE(NEW.ballot, X'') ELSE X'' END,
+        0
+    );
+    UPDATE vote_counts SET count = count + 1
+    WHERE poll_id = NEW.poll_id AND option_index = NEW.option_index AND ballot =
+        CASE WHEN (SELECT kind FROM polls WHERE id = NEW.poll_id) = 'multi' THEN COALESCE(NEW.ballot, X'') ELSE X'' END;
+END;
+"""
+
+# Eski bazalarga keyinroq qo'shilgan ustunlar
+MIGRATIONS = {
+    "polls": (
+        ("kind", "TEXT NOT NULL DEFAULT 'single'"),
+    ),
+    "votes": (
+        ("ballot", "BLOB"),
+    ),
+    "users": (
+        ("is_active", "INTEGER NOT NULL DEFAULT 1"),
+        ("is_subscribed", "INTEGER NOT NULL DEFAULT 0"),
+        ("last_seen", "REAL"),
+    ),
+}
+
+# SQLite (WAL) ombori. Yozuvlar navbatga qo'yiladi va fon vazifasi ularni
+# bitta tranzaksiyada diskka yozadi, shuning uchun ovoz berish fsync kutmaydi.
+class SqlitePollRepository(PollRepository):
+    def __init__(self, path: str, flush_interval: float = 0.5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.conn: Optional[sqlite3.Connection] = None
+        self.pending: List[Tuple[str, Tuple[Any, ...]]] = []
+        self.db_lock = asyncio.Lock()
+        # Bir vaqtda bitta flush: flush qaytganda undan oldin navbatga qo'yilgan yozuvlar
+        # bazada bo'ladi (fon flush'i yozayotgan yoki xato bilan qaytargan partiya ham)
+        self.flush_lock = asyncio.Lock()
+        self.flusher: Optional[asyncio.Task] = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        for table, columns in MIGRATIONS.items():
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for name, definition in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+        conn.commit()
+        conn.executescript(COUNTS_SCHEMA)
+        # Hisob jadvali bo'lmagan eski baza: mavjud ovozlardan bir marta to'ldiriladi
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'vote_counts'").fetchone() is None:
+            with conn:
+                conn.execute("DELETE FROM vote_counts")
+                conn.execute(
+                    "INSERT INTO vote_counts (poll_id, option_index, ballot, count) "
+                    "SELECT v.poll_id, v.option_index, "
+                    "CASE WHEN p.kind = 'multi' THEN COALESCE(v.ballot, X'') ELSE X'' END, COUNT(*) "
+                    "FROM votes v JOIN polls p ON p.id = v.poll_id GROUP BY 1, 2, 3"
+                )
+                conn.execute("INSERT INTO meta (key, value) VALUES ('vote_counts', 1)")
+        return conn
+
+    async def _run(self, func, *args):
+        async with self.db_lock:
+            return await asyncio.to_thread(func, *args)
+
+    async def open(self):
+        self.conn = await asyncio.to_thread(self._connect)
+        await self._run(self._sync_poll_counter)
+        self.flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+            self.flusher = None
+        await self.flush()
+        if self.conn is not None:
+            await self._run(self.conn.close)
+            self.conn = None
+
+    # Hisoblagich mavjud so'rovnomalar ID laridan orqada qolmasligi kerak
+    # (hisoblagichsiz eski bazalar uchun)
+    def _sync_poll_counter(self):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('next_poll_id', COALESCE((SELECT MAX(id) FROM polls), 0) + 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)"
+        )
+        self.conn.commit()
+
+    def _next_poll_id(self) -> int:
+        # UPDATE yozish qulfini darhol oladi, shuning uchun bir bazadagi bir nechta jarayon
+        # bir xil ID olmaydi
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'next_poll_id'")
+        value = self.conn.execute("SELECT value FROM meta WHERE key = 'next_poll_id'").fetchone()[0]
+        self.conn.commit()
+        return value - 1
+
+    def _query_one(self, sql: str, params: Tuple = ()):
+        return self.conn.execute(sql, params).fetchone()
+
+    def _query_all(self, sql: str, params: Tuple = ()):
+        return self.conn.execute(sql, params).fetchall()
+
+    async def load_polls(self) -> Dict[str, Dict]:
+        rows = await self._run(self._query_all,
+            "SELECT id, title, image, options, creator, created_at, is_active, kind FROM polls ORDER BY id")
+        # Bir nechta variantli so'rovnomalarda har bir tanlangan variant hisoblanadi,
+        # qolganlarida (shu jumladan afzallik bo'yicha) - birinchi tanlov
+        tallies = await self._run(self._query_all,
+            "SELECT poll_id, option_index, ballot, count FROM vote_counts")
+        polls: Dict[str, Dict] = {}
+        for poll_id, title, image, options, creator, created_at, is_active, kind in rows:
+            options = json.loads(options)
+            polls[str(poll_id)] = {
+                'title': title,
+                'image': image,
+                'options': options,
+                'kind': kind,
+                'votes': new_tally(len(options)),
+                'ballots': 0,
+                'creator': creator,
+                'created_at': created_at,
+                'is_active': bool(is_active)
+            }
+        for poll_id, option_index, ballot, count in tallies:
+            poll = polls.get(str(poll_id))
+            if not poll:
+                continue
+            poll['ballots'] += count
+            for choice in ballot or (option_index,):
+                if 0 <= choice < len(poll['options']):
+                    poll['votes'][choice] += count
+        return polls
+
+    def _load_ids(self, sql: str, params: Tuple = ()) -> IdSet:
+        return IdSet.from_sorted(row[0] for row in self.conn.execute(sql, params))
+
+    async def load_voters(self, poll_id: str) -> IdSet:
+        return await self._run(self._load_ids,
+            "SELECT user_id FROM votes WHERE poll_id = ? ORDER BY user_id", (int(poll_id),))
+
+    async def load_users(self) -> IdSet:
+        return await self._run(self._load_ids, "SELECT user_id FROM users ORDER BY user_id")
+
+    # Bir xil byulletenlar guruhlanadi: afzallik bo'yicha hisob uchun faqat ularning soni kerak
+    async def load_ballots(self, poll_id: str) -> Dict[bytes, int]:
+        rows = await self._run(self._query_all,
+            "SELECT ballot, option_index, COUNT(*) FROM votes WHERE poll_id = ? GROUP BY 1, 2", (int(poll_id),))
+        ballots: Dict[bytes, int] = {}
+        for ballot, option_index, count in rows:
+            key = bytes(ballot) if ballot is not None else bytes((option_index,))
+            ballots[key] = ballots.get(key, 0) + count
+        return ballots
+
+    # Alohida o'qish ulanishi orqali qatorlarni qismlab qaytaradi (WAL yozuvchilarni to'smaydi).
+    # Sinxron generator: uni fon oqimida (asyncio.to_thread) ishlatish kerak.
+    def _iter_rows(self, sql: str, params: Tuple, batch_size: int = 10000) -> Iterator[Tuple]:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_votes(self, poll_id: str) -> Iterator[Tuple[int, int, Optional[bytes], float]]:
+        return self._iter_rows(
+            "SELECT user_id, option_index, ballot, voted_at FROM votes WHERE poll_id = ? ORDER BY voted_at",
+            (int(poll_id),)
+        )
+
+    def iter_votes_since(self, since: float) -> Iterator[Tuple[str, int, Optional[bytes], float]]:
+        for poll_id, option_index, ballot, voted_at in self._iter_rows(
+            "SELECT poll_id, option_index, ballot, voted_at FROM votes WHERE voted_at >= ?", (since,)
+        ):
+            yield str(poll_id), option_index, ballot, voted_at
+
+    # ID navbatga qo'yilmaydi, darhol bazada ajratiladi
+    async def allocate_poll_id(self) -> str:
+        return str(await self._run(self._next_poll_id))
+
+    def save_poll(self, poll_id: str, poll: Dict):
+        self.pending.append((
+            "INSERT OR REPLACE INTO polls (id, title, image, options, creator, created_at, is_active, kind) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (int(poll_id), poll['title'], poll.get('image'), json.dumps(poll['options']),
+             poll['creator'], poll['created_at'], int(poll.get('is_active', True)), poll.get('kind', 'single'))
+        ))
+
+    def set_poll_active(self, poll_id: str, is_active: bool):
+        self.pending.append(("UPDATE polls SET is_active = ? WHERE id = ?", (int(is_active), int(poll_id))))
+
+    def delete_poll(self, poll_id: str):
+        self.pending.append(("DELETE FROM votes WHERE poll_id = ?", (int(poll_id),)))
+        self.pending.append(("DELETE FROM vote_counts WHERE poll_id = ?", (int(poll_id),)))
+        self.pending.append(("DELETE FROM live_messages WHERE poll_id = ?", (int(poll_id),)))
+        self.pending.append(("DELETE FROM polls WHERE id = ?", (int(poll_id),)))
+
+    def add_vote(self, poll_id: str, user_id: int, option_index: int, voted_at: float,
+                 ballot: Optional[bytes] = None):
+        self.pending.append((
+            "INSERT OR IGNORE INTO votes (poll_id, user_id, option_index, voted_at, ballot) "
+            "SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM polls WHERE id = ?)",
+            (int(poll_id), user_id, option_index, voted_at, ballot, int(poll_id))
+        ))
+
+    def add_user(self, user_id: int):
+        self.pending.append(("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,)))
+
+    async def load_inactive_users(self) -> Set[int]:
+        rows = await self._run(self._query_all, "SELECT user_id FROM users WHERE is_active = 0")
+        return {row[0] for row in rows}
+
+    async def load_recent_users(self, since: float) -> List[Tuple[int, float]]:
+        return await self._run(self._query_all,
+            "SELECT user_id, last_seen FROM users WHERE last_seen >= ?", (since,))
+
+    async def load_subscribed_users(self) -> Set[int]:
+        rows = await self._run(self._query_all, "SELECT user_id FROM users WHERE is_subscribed = 1")
+        return {row[0] for row in rows}
+
+    def set_user_active(self, user_id: int, is_active: bool):
+        self.pending.append(("UPDATE users SET is_active = ? WHERE user_id = ?", (int(is_active), user_id)))
+
+    def touch_user(self, user_id: int, seen_at: float):
+        self.pending.append(("UPDATE users SET last_seen = ? WHERE user_id = ?", (seen_at, user_id)))
+
+    def set_user_subscribed(self, user_id: int, is_subscribed: bool):
+        self.pending.append(("UPDATE users SET is_subscribed = ? WHERE user_id = ?", (int(is_subscribed), user_id)))
+
+    async def load_admin_notify_modes(self) -> Dict[int, str]:
+        rows = await self._run(self._query_all, "SELECT admin_id, notify_mode FROM admin_settings")
+        return {admin_id: mode for admin_id, mode in rows}
+
+    def set_admin_notify_mode(self, admin_id: int, mode: str):
+        self.pending.append((
+            "INSERT OR REPLACE INTO admin_settings (admin_id, notify_mode) VALUES (?, ?)",
+            (admin_id, mode)
+        ))
+
+    async def load_live_messages(self) -> Dict[str, List[Dict]]:
+        rows = await self._run(self._query_all,
+            "SELECT poll_id, chat_id, message_id, is_caption FROM live_messages")
+        result: Dict[str, List[Dict]] = {}
+        for poll_id, chat_id, message_id, is_caption in rows:
+            result.setdefault(str(poll_id), []).append({
+                'chat_id': chat_id,
+                'message_id': message_id,
+                'is_caption': bool(is_caption)
+            })
+        return result
+
+    def add_live_message(self, poll_id: str, chat_id: int, message_id: int, is_caption: bool):
+        self.pending.append((
+            "INSERT OR REPLACE INTO live_messages (chat_id, message_id, poll_id, is_caption) VALUES (?, ?, ?, ?)",
+            (chat_id, message_id, int(poll_id), int(is_caption))
+        ))
+
+    def remove_live_message(self, chat_id: int, message_id: int):
+        self.pending.append((
+            "DELETE FROM live_messages WHERE chat_id = ? AND message_id = ?", (chat_id, message_id)
+        ))
+
+    async def load_schedule(self) -> List[Tuple[str, float, Dict]]:
+        rows = await self._run(self._query_all, "SELECT key, run_at, payload FROM schedule")
+        return [(key, run_at, json.loads(payload)) for key, run_at, payload in rows]
+
+    def save_scheduled(self, key: str, run_at: float, payload: Dict):
+        self.pending.append((
+            "INSERT OR REPLACE INTO schedule (key, run_at, payload) VALUES (?, ?, ?)",
+            (key, run_at, json.dumps(payload))
+        ))
+
+    def remove_scheduled(self, key: str):
+        self.pending.append(("DELETE FROM schedule WHERE key = ?", (key,)))
+
+    def _write_batch(self, batch: List[Tuple[str, Tuple[Any, ...]]]):
+        with self.conn:
+            for sql, params in batch:
+                self.conn.execute(sql, params)
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending or self.conn is None:
+                return
+            batch, self.pending = self.pending, []
+            try:
+                await self._run(self._write_batch, batch)
+            except Exception as e:
+                logging.error(f"Ma'lumotlar bazasiga yozishda xato: {e}")
+                self.pending = batch + self.pending
+                raise
+
+    def _checkpoint_wal(self):
+        self.conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    # Navbatdagi yozuvlarni yozib, WAL faylini asosiy bazaga fsync bilan ko'chiradi
+    # Yozuvlar bazaga tushmagan bo'lsa xato beradi: chaqiruvchi (ovozlar jurnali) o'z
+    # yozuvlarini o'chirmasligi kerak
+    async def checkpoint(self):
+        await self.flush()
+        if self.conn is None:
+            if self.pending:
+                raise RuntimeError("Ma'lumotlar bazasi yopiq, navbatdagi yozuvlar saqlanmadi")
+            return
+        await self._run(self._checkpoint_wal)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass
+
+
+# Ovozlar jurnali (append-only). Har bir yozuv: poll_id, user_id, variant indeksi, vaqt.
+# Ko'p callbacklardan kelgan yozuvlar qisqa taymer bo'yicha bitta write+fsync bilan
+# saqlanadi (group commit). Checkpointda barcha ovozlar SQLite'ga yozilgach jurnal tozalanadi.
+class VoteJournal:
+    def __init__(self, path: str, commit_interval: float = 0.005):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.file = None
+        self.buffer: List[str] = []
+        self.waiters: List[asyncio.Future] = []
+        self.lock = asyncio.Lock()
+        self.commit_task: Optional[asyncio.Task] = None
+
+    async def open(self):
+        self.file = await asyncio.to_thread(open, self.path, "a", encoding="utf-8")
+
+    async def close(self):
+        await self.commit()
+        if self.file is not None:
+            await asyncio.to_thread(self.file.close)
+            self.file = None
+
+    @property
+    def rotated_path(self) -> str:
+        return self.path + ".old"
+
+    def _read_records(self) -> List[Tuple[str, int, int, float, Optional[bytes]]]:
+        records = []
+        for path in (self.rotated_path, self.path):
+            if os.path.exists(path):
+                records.extend(self._read_segment(path))
+        return records
+
+    @staticmethod
+    def _read_segment(path: str) -> List[Tuple[str, int, int, float, Optional[bytes]]]:
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                # Qulash paytida chala yozilgan oxirgi qator tashlab yuboriladi.
+                # Beshinchi maydon (byulleten, hex) faqat ko'p tanlovli ovozlarda bo'ladi.
+                if len(parts) not in (4, 5) or not line.endswith("\n"):
+                    continue
+                try:
+                    ballot = bytes.fromhex(parts[4]) if len(parts) == 5 else None
+                    records.append((parts[0], int(parts[1]), int(parts[2]), float(parts[3]), ballot))
+                except ValueError:
+                    continue
+        return records
+
+    # Ishga tushganda jurnaldagi ovozlarni bazaga qayta yozadi (takroriy yozuvlar e'tiborsiz qoldiriladi)
+    async def replay(self, repository: PollRepository) -> int:
+        records = await asyncio.to_thread(self._read_records)
+        for poll_id, user_id, option_index, voted_at, ballot in records:
+            repository.add_vote(poll_id, user_id, option_index, voted_at, ballot)
+        await repository.checkpoint()
+        await asyncio.to_thread(self._truncate)
+        return len(records)
+
+    def append(self, poll_id: str, user_id: int, option_index: int, voted_at: float,
+               ballot: Optional[bytes] = None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        line = f"{poll_id}\t{user_id}\t{option_index}\t{voted_at:.3f}"
+        self.buffer.append(f"{line}\t{ballot.hex()}\n" if ballot is not None else f"{line}\n")
+        self.waiters.append(future)
+        if self.commit_task is None:
+            self.commit_task = asyncio.create_task(self._commit_later())
+        return future
+
+    async def _commit_later(self):
+        await asyncio.sleep(self.commit_interval)
+        self.commit_task = None
+        await self.commit()
+
+    def _write(self, data: str):
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _truncate(self):
+        self._remove_rotated()
+        if self.file is not None:
+            self.file.truncate(0)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        elif os.path.exists(self.path):
+            open(self.path, "w").close()
+
+    async def commit(self):
+        async with self.lock:
+            if not self.buffer:
+                return
+            data, self.buffer = "".join(self.buffer), []
+            waiters, self.waiters = self.waiters, []
+            try:
+                await asyncio.to_thread(self._write, data)
+            except Exception as e:
+                logging.error(f"Ovozlar jurnaliga yozishda xato: {e}")
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for future in waiters:
+                if not future.done():
+                    future.set_result(None)
+
+    # Joriy segmentni .old ga o'tkazib, yangi bo'sh segment ochadi
+    def _rotate(self) -> bool:
+        if os.path.exists(self.rotated_path):
+            # Oldingi checkpoint tugallanmagan - eski segment hali o'chirilmagan
+            return True
+        if self.file is None or self.file.tell() == 0:
+            return False
+        self.file.close()
+        os.replace(self.path, self.rotated_path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        return True
+
+    def _remove_rotated(self):
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    # Jurnal qulf ostida faqat yangi segmentga almashtiriladi; bazaga yozish va eski
+    # segmentni o'chirish qulfdan tashqarida, shuning uchun ovozlarni tasdiqlash kutib qolmaydi.
+    # Eski segmentdagi har bir ovoz jurnalga yozilishidan oldin repository.add_vote orqali
+    # navbatga qo'yilgan, demak checkpoint ularning hammasini bazaga yozadi.
+    async def checkpoint(self, repository: PollRepository):
+        async with self.lock:
+            if self.file is None:
+                await repository.checkpoint()
+                await asyncio.to_thread(self._truncate)
+                return
+            rotated = await asyncio.to_thread(self._rotate)
+        await repository.checkpoint()
+        if rotated:
+            await asyncio.to_thread(self._remove_rotated)
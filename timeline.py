@@ -0,0 +1,82 @@
+from array import array
+from typing import List, Optional, Tuple
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+# So'rovnoma uchun vaqt bo'yicha ovozlar hisoblagichi. 60 ta daqiqalik va 24 ta soatlik
+# halqa bufer; har bir katakda variantlar bo'yicha sonlar. Xotira ovozlar soniga bog'liq emas.
+class VoteTimeline:
+    MINUTES = 60
+    HOURS = 24
+
+    def __init__(self, options: int):
+        self.options = options
+        self.minute_counts = array('I', [0] * (self.MINUTES * options))
+        self.minute_stamps = array('q', [-1] * self.MINUTES)
+        self.hour_counts = array('I', [0] * (self.HOURS * options))
+        self.hour_stamps = array('q', [-1] * self.HOURS)
+
+    @staticmethod
+    def _touch(counts: array, stamps: array, size: int, options: int, stamp: int) -> int:
+        slot = stamp % size
+        if stamps[slot] != stamp:
+            stamps[slot] = stamp
+            start = slot * options
+            for i in range(start, start + options):
+                counts[i] = 0
+        return slot * options
+
+    def record(self, option_index: int, voted_at: float):
+        minute = int(voted_at // 60)
+        if self.minute_stamps[minute % self.MINUTES] <= minute:
+            base = self._touch(self.minute_counts, self.minute_stamps, self.MINUTES, self.options, minute)
+            self.minute_counts[base + option_index] += 1
+        hour = minute // 60
+        if self.hour_stamps[hour % self.HOURS] <= hour:
+            base = self._touch(self.hour_counts, self.hour_stamps, self.HOURS, self.options, hour)
+            self.hour_counts[base + option_index] += 1
+
+    def _series(self, counts: array, stamps: array, size: int, current: int) -> List[int]:
+        series = []
+        for stamp in range(current - size + 1, current + 1):
+            slot = stamp % size
+            if stamps[slot] == stamp:
+                start = slot * self.options
+                series.append(sum(counts[start:start + self.options]))
+            else:
+                series.append(0)
+        return series
+
+    def minute_series(self, now: float) -> List[int]:
+        return self._series(self.minute_counts, self.minute_stamps, self.MINUTES, int(now // 60))
+
+    def hour_series(self, now: float) -> List[int]:
+        return self._series(self.hour_counts, self.hour_stamps, self.HOURS, int(now // 3600))
+
+    def option_totals_last_hour(self, now: float) -> List[int]:
+        current = int(now // 60)
+        totals = [0] * self.options
+        for stamp in range(current - self.MINUTES + 1, current + 1):
+            slot = stamp % self.MINUTES
+            if self.minute_stamps[slot] == stamp:
+                start = slot * self.options
+                for i in range(self.options):
+                    totals[i] += self.minute_counts[start + i]
+        return totals
+
+    def summary(self, now: float) -> Tuple[float, int, Optional[int], List[int], Optional[float]]:
+        minutes = self.minute_series(now)
+        hours = self.hour_series(now)
+        # Joriy daqiqa hali tugamagan, shuning uchun tezlik oxirgi 5 ta to'liq daqiqadan olinadi
+        rate = sum(minutes[-6:-1]) / 5
+        peak = max(minutes)
+        peak_ago = len(minutes) - 1 - minutes.index(peak) if peak else None
+        previous, recent = sum(hours[:12]), sum(hours[12:])
+        trend = (recent - previous) / previous * 100 if previous else None
+        return rate, peak, peak_ago, hours, trend
+
+def sparkline(values: List[int]) -> str:
+    top = max(values) if values else 0
+    if not top:
+        return SPARK_CHARS[0] * len(values)
+    return "".join(SPARK_CHARS[round(v / top * (len(SPARK_CHARS) - 1))] for v in values)
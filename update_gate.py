@@ -0,0 +1,84 @@
+import time
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple
+
+# Update'lar uchun ustuvorlikli navbat: bir vaqtda eng ko'pi bilan limit ta handler ishlaydi,
+# har bir sinfning o'z chegarasi bor. Bo'shagan joy har doim eng yuqori ustuvorlikdagi
+# (kichik raqamli) sinfning eng eski kutuvchisiga beriladi.
+#
+# Kutish vaqti chegaralangan (max_wait) kutuvchi shu vaqt ichida joy olmasa, navbatdan
+# chiqarilib rad etiladi; max_depth - bu sinfda kutayotganlar shunchadan ko'p bo'lsa,
+# yangi update darhol rad etiladi. Bekor qilingan va muddati o'tgan yozuvlar navbatdan
+# o'chirilmaydi, joy berilayotganda tashlab yuboriladi.
+class UpdateGate:
+    def __init__(self, limit: int, class_limits: Sequence[int]):
+        self.limit = limit
+        self.class_limits = list(class_limits)
+        self.active = [0] * len(class_limits)
+        self.queued = [0] * len(class_limits)
+        self.total = 0
+        self.waiting: List[Deque[Tuple[float, asyncio.Future]]] = [deque() for _ in class_limits]
+        self.shed = [0] * len(class_limits)
+
+    def _free(self, priority: int) -> bool:
+        return self.total < self.limit and self.active[priority] < self.class_limits[priority]
+
+    def _blocked(self, priority: int) -> bool:
+        # Joy olishi mumkin bo'lgan, shu yoki yuqoriroq ustuvorlikdagi kutuvchi bor
+        return any(self.queued[c] and self.active[c] < self.class_limits[c] for c in range(priority + 1))
+
+    def _take(self, priority: int):
+        self.active[priority] += 1
+        self.total += 1
+
+    # True - joy berildi (ish tugagach release chaqirilishi shart), False - rad etildi
+    async def acquire(self, priority: int, max_wait: Optional[float] = None,
+                      max_depth: Optional[int] = None) -> bool:
+        if self._free(priority) and not self._blocked(priority):
+            self._take(priority)
+            return True
+        if max_depth is not None and self.queued[priority] >= max_depth:
+            self.shed[priority] += 1
+            return False
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.waiting[priority].append((time.monotonic(), future))
+        self.queued[priority] += 1
+        timer = loop.call_later(max_wait, self._expire, priority, future) if max_wait is not None else None
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if not future.cancelled() and future.result():
+                # Joy berilgan, lekin vazifa bekor qilindi - joyni boshqasiga qaytarish
+                self.release(priority)
+            elif future.cancelled():
+                self.queued[priority] -= 1
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def _expire(self, priority: int, future: asyncio.Future):
+        if not future.done():
+            future.set_result(False)
+            self.queued[priority] -= 1
+            self.shed[priority] += 1
+
+    def release(self, priority: int):
+        self.active[priority] -= 1
+        self.total -= 1
+        self._grant()
+
+    def _grant(self):
+        for priority, waiting in enumerate(self.waiting):
+            while waiting and self._free(priority):
+                _, future = waiting.popleft()
+                if future.done():
+                    continue
+                future.set_result(True)
+                self.queued[priority] -= 1
+                self._take(priority)
+            if waiting and self.total >= self.limit:
+                return
@@ -0,0 +1,83 @@
+import bisect
+from array import array
+from typing import Iterable, Iterator, List
+
+# Telegram ID lari uchun ixcham to'plam. Yangi ID lar kichik bufer-setga tushadi;
+# bufer to'lganda u saralangan array('q') blokiga aylanadi (har bir ID 8 bayt).
+# Bloklar o'lchami bo'yicha birlashtiriladi, shuning uchun ular soni O(log n),
+# a'zolikni tekshirish esa har bir blokda ikkilik qidiruv.
+class IdSet:
+    BUFFER_SIZE = 4096
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.blocks: List[array] = []
+        self.buffer = set()
+        self.size = 0
+        self.update(ids)
+
+    # Takrorlanmaydigan va o'sish tartibida saralangan ID lardan (masalan, bazadan) tez qurish
+    @classmethod
+    def from_sorted(cls, ids: Iterable[int]) -> "IdSet":
+        result = cls()
+        block = array('q', ids)
+        if block:
+            result.blocks.append(block)
+            result.size = len(block)
+        return result
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "IdSet":
+        block = array('q')
+        block.frombytes(data)
+        return cls.from_sorted(block)
+
+    def to_bytes(self) -> bytes:
+        self.compact()
+        return self.blocks[0].tobytes() if self.blocks else b""
+
+    def __contains__(self, user_id: int) -> bool:
+        if user_id in self.buffer:
+            return True
+        for block in self.blocks:
+            index = bisect.bisect_left(block, user_id)
+            if index < len(block) and block[index] == user_id:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[int]:
+        for block in self.blocks:
+            yield from block
+        yield from list(self.buffer)
+
+    def add(self, user_id: int):
+        if user_id in self:
+            return
+        self.buffer.add(user_id)
+        self.size += 1
+        if len(self.buffer) >= self.BUFFER_SIZE:
+            self._flush_buffer()
+
+    def update(self, ids: Iterable[int]):
+        for user_id in ids:
+            self.add(user_id)
+
+    def _flush_buffer(self):
+        self.blocks.append(array('q', sorted(self.buffer)))
+        self.buffer = set()
+        # Oxirgi blok oldingisining yarmidan katta bo'lsa, ikkalasi birlashtiriladi
+        while len(self.blocks) > 1 and len(self.blocks[-1]) * 2 >= len(self.blocks[-2]):
+            last = self.blocks.pop()
+            self.blocks[-1] = array('q', sorted(self.blocks[-1] + last))
+
+    def compact(self):
+        if self.buffer:
+            self.blocks.append(array('q', sorted(self.buffer)))
+            self.buffer = set()
+        if len(self.blocks) > 1:
+            merged = array('q')
+            for block in self.blocks:
+                merged.extend(block)
+            self.blocks = [array('q', sorted(merged))]